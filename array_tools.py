@@ -0,0 +1,13 @@
+"""Array helpers shared by the chapter engines."""
+
+
+def readonly(*arrays):
+    """Mark arrays read-only and return them as a tuple.
+
+    The engines memoise their results with lru_cache, so every caller gets
+    the same array objects; freezing them keeps one caller's in-place edit
+    from leaking into everyone else's cached result.
+    """
+    for arr in arrays:
+        arr.flags.writeable = False
+    return arrays
@@ -0,0 +1,124 @@
+"""Helpers for browsing and exporting the generated example datasets.
+
+The app keeps every example dataset cached on the server, so these helpers
+only ever hand one page of rows to the browser, and exports are written
+chunk by chunk instead of materialising a full CSV string first.
+"""
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PAGE_SIZES = [10, 25, 50, 100, 250]
+
+# label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": ("arrow", "application/vnd.apache.arrow.file"),
+}
+EXPORT_CHUNK_ROWS = 100_000
+
+
+def page_count(n_rows, page_size):
+    """Number of pages needed to show n_rows (always at least one)."""
+    return max(1, -(-n_rows // page_size))
+
+
+def sort_order(column, ascending=True):
+    """Row positions that sort a column (stable, missing values last)."""
+    ordered = pd.Series(column.to_numpy()).sort_values(
+        ascending=ascending, kind="stable", na_position="last"
+    )
+    return ordered.index.to_numpy()
+
+
+def get_page(df, page, page_size, order=None):
+    """Return rows of one page (1-based), optionally through a sort order."""
+    page = min(max(int(page), 1), page_count(len(df), page_size))
+    start = (page - 1) * page_size
+    stop = min(start + page_size, len(df))
+    if order is None:
+        return df.iloc[start:stop]
+    return df.iloc[np.asarray(order[start:stop])]
+
+
+def iter_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield consecutive row slices (at least one, even for an empty frame)."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_export(df, fmt, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Stream df into the binary file object `out` in one of EXPORT_FORMATS."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    if fmt in ("CSV", "CSV (gzip)"):
+        stream = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=5, mtime=0) if fmt == "CSV (gzip)" else out
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        for i, chunk in enumerate(iter_chunks(df, chunk_rows)):
+            chunk.to_csv(text, index=False, header=(i == 0))
+        text.flush()
+        text.detach()
+        if stream is not out:
+            stream.close()
+        return
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    if fmt == "Parquet":
+        writer = pq.ParquetWriter(out, schema)
+    else:
+        writer = pa.ipc.new_file(out, schema)
+    with writer:
+        for chunk in iter_chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_dataset(df, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Return the bytes of df exported in the chosen format."""
+    buffer = io.BytesIO()
+    write_export(df, fmt, buffer, chunk_rows)
+    return buffer.getvalue()
+
+
+def group_aggregates(df, group_col, value_cols):
+    """Per-group count, sum, mean and median of value_cols in one pass.
+
+    Rows are factorized to integer codes once; sums and counts come from
+    `np.bincount` and medians from a single lexsort by (code, value), which
+    leaves each group's values contiguous and sorted. The result is indexed
+    by group label in order of first appearance, with a "count" column and
+    "<col>_sum", "<col>_mean" and "<col>_median" for each value column
+    (missing values are skipped), so a category lookup is a single `.loc`.
+    """
+    codes, labels = pd.factorize(df[group_col], sort=False)
+    keep = codes >= 0
+    n_groups = len(labels)
+    out = {"count": np.bincount(codes[keep], minlength=n_groups)}
+
+    for col in value_cols:
+        values = df[col].to_numpy(dtype=float)
+        valid = keep & ~np.isnan(values)
+        col_codes, col_values = codes[valid], values[valid]
+        counts = np.bincount(col_codes, minlength=n_groups)
+        sums = np.bincount(col_codes, weights=col_values, minlength=n_groups)
+
+        ordered = col_values[np.lexsort((col_values, col_codes))]
+        starts = np.cumsum(counts) - counts
+        lower = np.minimum(starts + (counts - 1) // 2, max(len(ordered) - 1, 0))
+        upper = np.minimum(starts + counts // 2, max(len(ordered) - 1, 0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        medians = (ordered[lower] + ordered[upper]) / 2 if len(ordered) else np.full(n_groups, np.nan)
+
+        empty = counts == 0
+        out[f"{col}_sum"] = sums
+        out[f"{col}_mean"] = np.where(empty, np.nan, means)
+        out[f"{col}_median"] = np.where(empty, np.nan, medians)
+
+    return pd.DataFrame(out, index=pd.Index(labels, name=group_col))
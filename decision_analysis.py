@@ -0,0 +1,342 @@
+"""Decision-analysis engines for the startup launch example (Chapter 6)."""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from array_tools import readonly
+
+MC_BATCH_SIZE = 1_000_000
+MC_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+PROB_KEYS = ("prob_success", "prob_moderate", "prob_failure")
+EMV_INPUTS = PROB_KEYS + ("revenue_high", "revenue_moderate", "revenue_low", "dev_cost", "marketing_cost")
+
+MonteCarloResult = namedtuple(
+    "MonteCarloResult",
+    ["profits", "mean", "std", "percentiles", "prob_loss", "var", "cvar"],
+)
+
+
+def _lognormal_params(mean, cv):
+    """mu/sigma of a lognormal with the given mean and coefficient of variation."""
+    sigma = np.sqrt(np.log1p(cv ** 2))
+    mu = np.log(np.maximum(mean, 1e-12)) - sigma ** 2 / 2
+    return mu, sigma
+
+
+@lru_cache(maxsize=16)
+def simulate_launch(dev_cost, marketing_cost, revenues, probabilities, revenue_cv=0.3,
+                    cost_cv=0.15, prob_concentration=50.0, n_draws=1_000_000,
+                    confidence=0.95, seed=42):
+    """Monte Carlo profit distribution for the product launch decision.
+
+    Each draw samples scenario probabilities from a Dirichlet centred on
+    `probabilities` (larger `prob_concentration` = more confidence), picks a
+    scenario, then draws that scenario's revenue and both costs from
+    lognormals with the given coefficients of variation. `revenues` and
+    `probabilities` are (high, moderate, failure) tuples. Draws are made in
+    vectorised batches of MC_BATCH_SIZE.
+
+    VaR and CVaR are reported as positive losses at the `confidence` level.
+    """
+    rng = np.random.default_rng(seed)
+    revenues = np.asarray(revenues, dtype=float)
+    base_probs = np.asarray(probabilities, dtype=float)
+    base_probs = base_probs / base_probs.sum()
+    rev_mu, rev_sigma = _lognormal_params(revenues, revenue_cv)
+    dev_mu, cost_sigma = _lognormal_params(dev_cost, cost_cv)
+    mkt_mu, _ = _lognormal_params(marketing_cost, cost_cv)
+    alpha = np.maximum(prob_concentration * base_probs, 1e-3)
+
+    profits = np.empty(n_draws)
+    for start in range(0, n_draws, MC_BATCH_SIZE):
+        size = min(MC_BATCH_SIZE, n_draws - start)
+
+        weights = rng.standard_gamma(alpha, size=(size, 3))
+        totals = weights.sum(axis=1, keepdims=True)
+        probs = np.where(totals > 0, weights / np.where(totals > 0, totals, 1), base_probs)
+        scenario = (rng.random((size, 1)) > np.cumsum(probs, axis=1)[:, :2]).sum(axis=1)
+
+        revenue = np.exp(rev_mu[scenario] + rev_sigma * rng.standard_normal(size))
+        revenue = np.where(revenues[scenario] > 0, revenue, 0.0)
+        cost = (np.exp(dev_mu + cost_sigma * rng.standard_normal(size)) +
+                np.exp(mkt_mu + cost_sigma * rng.standard_normal(size)))
+        profits[start:start + size] = revenue - cost
+
+    tail_q = (1 - confidence) * 100
+    cut = np.percentile(profits, [tail_q, *MC_PERCENTILES])
+    var_cut, pct_values = cut[0], cut[1:]
+    readonly(profits)
+
+    return MonteCarloResult(
+        profits=profits,
+        mean=float(profits.mean()),
+        std=float(profits.std()),
+        percentiles=dict(zip(MC_PERCENTILES, pct_values.tolist())),
+        prob_loss=float((profits < 0).mean()),
+        var=float(-var_cut),
+        cvar=float(-profits[profits <= var_cut].mean()),
+    )
+
+
+def launch_emv(prob_success, prob_moderate, prob_failure, revenue_high, revenue_moderate,
+               revenue_low, dev_cost, marketing_cost):
+    """Expected launch profit; every argument may be an array (broadcast).
+
+    Combinations with a negative scenario probability are infeasible and
+    come back as NaN.
+    """
+    total_cost = dev_cost + marketing_cost
+    emv = (prob_success * (revenue_high - total_cost) +
+           prob_moderate * (revenue_moderate - total_cost) +
+           prob_failure * (revenue_low - total_cost))
+    feasible = (np.asarray(prob_success) >= 0) & (np.asarray(prob_moderate) >= 0) & (np.asarray(prob_failure) >= 0)
+    return np.where(feasible, emv, np.nan)
+
+
+def _evaluate(base, overrides):
+    """EMV with some inputs replaced by arrays, keeping probabilities summing to 1.
+
+    The first probability not being varied (moderate, then failure, then
+    success) absorbs the change: moderate when success or failure moves,
+    failure when moderate moves, and success when both of those move.
+    """
+    params = {name: np.asarray(value, dtype=float) for name, value in base.items()}
+    params.update({name: np.asarray(value, dtype=float) for name, value in overrides.items()})
+    if any(name in PROB_KEYS for name in overrides):
+        absorber = next(k for k in ("prob_moderate", "prob_failure", "prob_success") if k not in overrides)
+        others = [k for k in PROB_KEYS if k != absorber]
+        params[absorber] = 1 - params[others[0]] - params[others[1]]
+    return launch_emv(**params)
+
+
+def _frozen(base):
+    return tuple(sorted((name, float(base[name])) for name in EMV_INPUTS))
+
+
+def emv_curve(base, name, values):
+    """EMV as one input sweeps over `values` (all other inputs at base)."""
+    return _evaluate(base, {name: values})
+
+
+def emv_surface(base, x_name, x_range, y_name, y_range, resolution=1000):
+    """EMV over a resolution x resolution grid of two inputs, in one broadcast.
+
+    Returns (x_values, y_values, emv) with emv shaped (len(y), len(x)).
+    """
+    return _emv_surface(_frozen(base), x_name, tuple(x_range), y_name, tuple(y_range), resolution)
+
+
+@lru_cache(maxsize=4)
+def _emv_surface(base, x_name, x_range, y_name, y_range, resolution):
+    x_values = np.linspace(*x_range, resolution)
+    y_values = np.linspace(*y_range, resolution)
+    grid = _evaluate(dict(base), {x_name: x_values[None, :], y_name: y_values[:, None]})
+    grid = np.broadcast_to(grid, (resolution, resolution)).copy()
+    return readonly(x_values, y_values, grid)
+
+
+def emv_tornado(base, swing=0.2, prob_swing=0.1):
+    """One-at-a-time EMV swings for every input, evaluated as one array pass.
+
+    Monetary inputs move by +/- `swing` (relative), probabilities by
+    +/- `prob_swing` (absolute). A probability can only rise as far as the
+    probability absorbing the change (moderate, or failure when moderate
+    itself is swung) has room to fall, and never below 0, so every row is
+    a feasible scenario mix. The base probabilities must each lie in
+    [0, 1] and sum to 1. Returns a DataFrame sorted by the size of the
+    swing.
+    """
+    probs = np.array([base[name] for name in PROB_KEYS], dtype=float)
+    if (probs < 0).any() or (probs > 1).any() or abs(probs.sum() - 1) > 1e-9:
+        raise ValueError("Scenario probabilities must each be between 0 and 1 and sum to 1")
+    return _emv_tornado(_frozen(base), swing, prob_swing).copy()
+
+
+@lru_cache(maxsize=32)
+def _emv_tornado(base, swing, prob_swing):
+    base = dict(base)
+    names = np.array(EMV_INPUTS)
+    k = len(names)
+    base_values = np.array([base[n] for n in names])
+    is_prob = np.isin(names, PROB_KEYS)
+    absorber = {"prob_success": "prob_moderate", "prob_moderate": "prob_failure", "prob_failure": "prob_moderate"}
+    room = np.array([max(base[absorber[n]], 0.0) if n in absorber else np.inf for n in names])
+    low = np.where(is_prob, np.maximum(base_values - prob_swing, 0), base_values * (1 - swing))
+    high = np.where(is_prob, base_values + np.minimum(prob_swing, room), base_values * (1 + swing))
+
+    # Row 2i swings input i low, row 2i+1 swings it high
+    values = np.tile(base_values, (2 * k, 1))
+    rows = np.arange(k)
+    values[2 * rows, rows] = low
+    values[2 * rows + 1, rows] = high
+    params = dict(zip(names, values.T))
+
+    swung = np.repeat(names, 2)
+    ps, pm, pf = params["prob_success"], params["prob_moderate"], params["prob_failure"]
+    # The swing limits keep the absorbed probability non-negative up to rounding
+    params["prob_moderate"] = np.where(np.isin(swung, ["prob_success", "prob_failure"]),
+                                       np.maximum(1 - ps - pf, 0), pm)
+    params["prob_failure"] = np.where(swung == "prob_moderate", np.maximum(1 - ps - pm, 0), pf)
+    emv = launch_emv(**params)
+
+    table = pd.DataFrame({
+        "Input": names,
+        "Low Value": low,
+        "High Value": high,
+        "EMV Low": emv[0::2],
+        "EMV High": emv[1::2],
+    })
+    table["Swing"] = (table["EMV High"] - table["EMV Low"]).abs()
+    return table.sort_values("Swing", ascending=False, ignore_index=True)
+
+
+DECISION, CHANCE, TERMINAL = "decision", "chance", "terminal"
+
+RollbackResult = namedtuple("RollbackResult", ["values", "best_child", "optimal"])
+TreeLayout = namedtuple("TreeLayout", ["x", "y"])
+
+
+class DecisionTree:
+    """Decision tree stored as flat arrays indexed by node id.
+
+    Nodes are added parent-first. Each node carries the cash flow incurred
+    when it is reached (`payoff`); children of chance nodes also carry their
+    branch probability. Rollback and layout work level by level with NumPy,
+    so trees with thousands of nodes evaluate in milliseconds.
+    """
+
+    def __init__(self):
+        self.kind, self.label, self.parent = [], [], []
+        self.probability, self.payoff, self.depth = [], [], []
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, label, parent=None, probability=1.0, payoff=0.0):
+        if parent is not None and self.kind[parent] == TERMINAL:
+            raise ValueError("Terminal nodes cannot have children")
+        self.kind.append(kind)
+        self.label.append(label)
+        self.parent.append(-1 if parent is None else parent)
+        self.probability.append(probability)
+        self.payoff.append(payoff)
+        self.depth.append(0 if parent is None else self.depth[parent] + 1)
+        return len(self.kind) - 1
+
+    def decision(self, label, parent=None, probability=1.0, payoff=0.0):
+        return self.add(DECISION, label, parent, probability, payoff)
+
+    def chance(self, label, parent=None, probability=1.0, payoff=0.0):
+        return self.add(CHANCE, label, parent, probability, payoff)
+
+    def terminal(self, label, parent=None, probability=1.0, payoff=0.0):
+        return self.add(TERMINAL, label, parent, probability, payoff)
+
+    def arrays(self):
+        kind = np.array(self.kind)
+        return (kind, np.array(self.parent), np.array(self.probability, dtype=float),
+                np.array(self.payoff, dtype=float), np.array(self.depth))
+
+    def rollback(self):
+        """Backward induction: chance nodes take expectations, decisions the max.
+
+        Returns node values, the best child of every decision node (-1
+        elsewhere) and a mask of nodes on the optimal policy path(s).
+        """
+        kind, parent, prob, payoff, depth = self.arrays()
+        n = len(kind)
+        is_chance = kind == CHANCE
+        expected = np.zeros(n)
+        best = np.full(n, -np.inf)
+        values = payoff.copy()
+
+        for d in range(depth.max(), 0, -1):
+            nodes = np.flatnonzero(depth == d)
+            values[nodes] += np.where(is_chance[nodes], expected[nodes],
+                                      np.where(kind[nodes] == DECISION, best[nodes], 0.0))
+            parents = parent[nodes]
+            expected += np.bincount(parents, weights=prob[nodes] * values[nodes], minlength=n)
+            np.maximum.at(best, parents, values[nodes])
+        roots = np.flatnonzero(depth == 0)
+        values[roots] += np.where(is_chance[roots], expected[roots],
+                                  np.where(kind[roots] == DECISION, best[roots], 0.0))
+
+        # Best child per decision node: highest value first within each parent
+        children = np.flatnonzero((parent >= 0) & (kind[np.maximum(parent, 0)] == DECISION))
+        order = children[np.lexsort((-values[children], parent[children]))]
+        parents, first = np.unique(parent[order], return_index=True)
+        best_child = np.full(n, -1)
+        best_child[parents] = order[first]
+
+        # A node is on the optimal path if its parent is, and it is either the
+        # chosen child of a decision or any branch of a chance node
+        optimal = np.zeros(n, dtype=bool)
+        optimal[roots] = True
+        for d in range(1, depth.max() + 1):
+            nodes = np.flatnonzero(depth == d)
+            par = parent[nodes]
+            optimal[nodes] = optimal[par] & ((kind[par] == CHANCE) | (best_child[par] == nodes))
+
+        return RollbackResult(values, best_child, optimal)
+
+    def layout(self):
+        """Tidy left-to-right layout: x is depth, leaves get consecutive rows
+        in depth-first order and parents sit midway between their children."""
+        kind, parent, _, _, depth = self.arrays()
+        n = len(kind)
+        children = [[] for _ in range(n)]
+        for node, par in enumerate(self.parent):
+            if par >= 0:
+                children[par].append(node)
+
+        leaf_y = np.full(n, np.nan)
+        row = 0
+        stack = list(np.flatnonzero(depth == 0)[::-1])
+        while stack:
+            node = stack.pop()
+            if children[node]:
+                stack.extend(reversed(children[node]))
+            else:
+                leaf_y[node] = row
+                row += 1
+
+        low = np.where(np.isnan(leaf_y), np.inf, leaf_y)
+        high = np.where(np.isnan(leaf_y), -np.inf, leaf_y)
+        for d in range(depth.max(), 0, -1):
+            nodes = np.flatnonzero(depth == d)
+            np.minimum.at(low, parent[nodes], low[nodes])
+            np.maximum.at(high, parent[nodes], high[nodes])
+        y = (low + high) / 2
+        return TreeLayout(depth.astype(float), row - 1 - y)
+
+
+def build_exploration_tree(stages, test_cost, prior_success, test_accuracy, success_value, drill_cost):
+    """Staged exploration decision: test again, drill now, or walk away.
+
+    Each test costs `test_cost` and reports a positive signal with
+    probability `test_accuracy` if the prospect is commercial (and
+    1 - test_accuracy otherwise); the success probability is updated by
+    Bayes' rule along every branch. Up to `stages` tests can be run, so the
+    tree grows as roughly 6 * 2**stages nodes.
+    """
+    tree = DecisionTree()
+
+    def grow(node, p_success, remaining):
+        drill = tree.chance("Drill", node, payoff=-drill_cost)
+        tree.terminal("Commercial", drill, p_success, success_value)
+        tree.terminal("Dry", drill, 1 - p_success)
+        tree.terminal("Walk Away", node)
+        if remaining == 0:
+            return
+        test = tree.chance("Test", node, payoff=-test_cost)
+        p_positive = test_accuracy * p_success + (1 - test_accuracy) * (1 - p_success)
+        for signal, p_signal, likelihood in (("Positive", p_positive, test_accuracy),
+                                            ("Negative", 1 - p_positive, 1 - test_accuracy)):
+            posterior = likelihood * p_success / p_signal if p_signal > 0 else p_success
+            grow(tree.decision(signal, test, p_signal), posterior, remaining - 1)
+
+    grow(tree.decision("Explore?"), prior_success, stages)
+    return tree
@@ -0,0 +1,262 @@
+"""Distribution curves for the explorer (Chapter 5) and MLE fits for data columns."""
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.special import digamma, gammaln, polygamma
+
+from array_tools import readonly
+
+# family -> {parameter: (first, last, step)}, mirroring the explorer's sliders
+PARAM_GRIDS = {
+    "Normal": {"mean": (-10.0, 10.0, 0.5), "std": (0.5, 5.0, 0.5)},
+    "Binomial": {"n": (1, 50, 1), "p": (0.0, 1.0, 0.05)},
+    "Poisson": {"lam": (0.5, 20.0, 0.5)},
+    "Exponential": {"lam": (0.1, 5.0, 0.1)},
+}
+DISCRETE_FAMILIES = ("Binomial", "Poisson")
+CURVE_POINTS = 1000  # x values per continuous curve
+
+CurveTable = namedtuple("CurveTable", ["params", "x", "density", "cdf"])
+Curve = namedtuple("Curve", ["x", "density", "cdf"])
+
+
+def param_values(family, name):
+    """Every value a parameter can take on its slider grid."""
+    first, last, step = PARAM_GRIDS[family][name]
+    return np.round(first + step * np.arange(int(round((last - first) / step)) + 1), 10)
+
+
+@lru_cache(maxsize=None)
+def curve_table(family):
+    """PDF/PMF and CDF of a family at every point of its parameter grid.
+
+    `params` holds the grid of each parameter (in PARAM_GRIDS order) and
+    `x`, `density` and `cdf` have shape (*grid sizes, points), so a slider
+    setting is an index into the table. Continuous curves use their own
+    x range (mean ± 4σ, or 0 to 10 mean waits); discrete curves share one
+    support wide enough for the largest parameter. Built once per family;
+    arrays are read-only.
+    """
+    if family not in PARAM_GRIDS:
+        raise ValueError(f"Unknown distribution: {family}")
+    params = tuple(param_values(family, name) for name in PARAM_GRIDS[family])
+
+    if family == "Normal":
+        mean, std = params[0][:, None, None], params[1][None, :, None]
+        z = np.linspace(-4, 4, CURVE_POINTS)
+        x = mean + std * z
+        density = np.broadcast_to(stats.norm.pdf(z) / std, x.shape)
+        cdf = np.broadcast_to(stats.norm.cdf(z), x.shape)
+    elif family == "Binomial":
+        n, p = params[0][:, None, None], params[1][None, :, None]
+        support = np.arange(params[0][-1] + 1)
+        x = np.broadcast_to(support, (len(params[0]), len(params[1]), len(support)))
+        density = stats.binom.pmf(support, n, p)
+        cdf = stats.binom.cdf(support, n, p)
+    elif family == "Poisson":
+        lam = params[0][:, None]
+        support = np.arange(int(params[0][-1] * 3) + 10)
+        x = np.broadcast_to(support, (len(params[0]), len(support)))
+        density = stats.poisson.pmf(support, lam)
+        cdf = stats.poisson.cdf(support, lam)
+    else:
+        lam = params[0][:, None]
+        x = np.linspace(0, 10, CURVE_POINTS) / lam
+        density = lam * np.exp(-lam * x)
+        cdf = -np.expm1(-lam * x)
+
+    return CurveTable(readonly(*params), *readonly(
+        np.ascontiguousarray(x), np.ascontiguousarray(density), np.ascontiguousarray(cdf)
+    ))
+
+
+def _grid_index(family, name, value):
+    values = param_values(family, name)
+    idx = np.rint((np.asarray(value, dtype=float) - values[0]) / (values[1] - values[0])).astype(int)
+    inside = (idx >= 0) & (idx < len(values))
+    if not inside.all() or not np.allclose(values[idx], value):
+        raise ValueError(f"{family} {name}={value} is not on the slider grid")
+    return idx
+
+
+def _support_size(family, settings):
+    """Points of the shared discrete support to show for these settings."""
+    if family == "Binomial":
+        return int(np.max(settings["n"])) + 1
+    return int(np.max(settings["lam"]) * 3) + 10
+
+
+def distribution_curve(family, **params):
+    """Look up one curve, e.g. distribution_curve("Normal", mean=0.0, std=1.0)."""
+    return Curve(*(arr[0] for arr in distribution_curves(family, **params)))
+
+
+def distribution_curves(family, **params):
+    """Look up several curves at once for an overlay.
+
+    Each parameter takes a scalar or a sequence; they are broadcast together
+    and fancy-indexed out of the cached table, so the result has one row
+    per setting. Discrete curves share their x values (cut to the support
+    the widest setting needs); continuous curves keep their own ranges.
+    """
+    table = curve_table(family)
+    names = list(PARAM_GRIDS[family])
+    if set(params) != set(names):
+        raise ValueError(f"{family} needs parameters {names}")
+    settings = dict(zip(names, np.broadcast_arrays(*(np.atleast_1d(params[n]) for n in names))))
+    idx = tuple(_grid_index(family, name, settings[name]) for name in names)
+
+    x, density, cdf = table.x[idx], table.density[idx], table.cdf[idx]
+    if family in DISCRETE_FAMILIES:
+        size = _support_size(family, settings)
+        x, density, cdf = x[:, :size], density[:, :size], cdf[:, :size]
+    return Curve(x, density, cdf)
+
+
+FIT_FAMILIES = ("Normal", "Gamma", "Exponential", "Lognormal", "Poisson")
+FIT_SAMPLE_CAP = 50_000  # largest sample the fits run on
+
+DistributionFit = namedtuple(
+    "DistributionFit", ["ranking", "params", "skipped", "discretised", "n_used", "n_total"]
+)
+
+
+def column_fingerprint(values):
+    """Content hash of a numeric column, usable as a cache key."""
+    values = np.ascontiguousarray(values, dtype=float)
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+
+def fit_sample(values, max_size=FIT_SAMPLE_CAP, seed=42):
+    """Finite values of a column, randomly thinned to at most max_size."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) > max_size:
+        rng = np.random.default_rng(seed)
+        values = values[np.sort(rng.choice(len(values), max_size, replace=False))]
+    return values
+
+
+def _gamma_shape(s, steps=8):
+    """Gamma MLE shape from s = log(mean) - mean(log x), by Newton's method."""
+    k = (3 - s + np.sqrt((s - 3) ** 2 + 24 * s)) / (12 * s)  # Minka's starting point
+    for _ in range(steps):
+        k -= (np.log(k) - digamma(k) - s) / (1 / k - polygamma(1, k))
+    return k
+
+
+def fitted_distribution(family, params):
+    """Frozen scipy distribution for one entry of DistributionFit.params."""
+    if family == "Normal":
+        return stats.norm(params["mean"], params["std"])
+    if family == "Gamma":
+        return stats.gamma(params["shape"], scale=params["scale"])
+    if family == "Exponential":
+        return stats.expon(scale=params["mean"])
+    if family == "Lognormal":
+        return stats.lognorm(params["sigma_log"], scale=np.exp(params["mu_log"]))
+    if family == "Poisson":
+        return stats.poisson(params["lam"])
+    raise ValueError(f"Unknown distribution: {family}")
+
+
+def _ks_statistic(sorted_x, cdf):
+    """Largest gap between the empirical CDF and each row of `cdf`.
+
+    Ties are collapsed first, so for a discrete fit the comparison is made
+    at each distinct value and just before it (with the fitted CDF at the
+    previous integer passed in as the "before" row).
+    """
+    n = len(sorted_x)
+    last = np.r_[sorted_x[1:] != sorted_x[:-1], True]
+    first = np.r_[True, sorted_x[1:] != sorted_x[:-1]]
+    after = np.flatnonzero(last) + 1
+    before = np.flatnonzero(first)
+    return np.maximum(np.abs(after / n - cdf[0][:, last]).max(axis=1),
+                      np.abs(before / n - cdf[1][:, first]).max(axis=1))
+
+
+def fit_distributions(values, max_size=FIT_SAMPLE_CAP, seed=42):
+    """Maximum-likelihood fits of FIT_FAMILIES ranked by AIC, with KS distances.
+
+    Fits run on a random subsample of at most `max_size` values. Every MLE
+    is closed form except the gamma shape (a few Newton steps), and the KS
+    statistics of all continuous fits come from one stacked CDF array.
+    Families whose support does not cover the data (positive families on
+    data with zeros or negatives, Poisson on non-integer data) are listed
+    in `skipped` with the reason. KS p-values treat the fitted parameters
+    as known, so they are optimistic.
+
+    On whole-number data the continuous fits are scored as discretised
+    distributions (the mass of each value's unit bin, CDF(x + 0.5) -
+    CDF(x - 0.5)), so their likelihoods and AIC are probabilities on the
+    same scale as the Poisson PMF; `discretised` records when this applied.
+    """
+    x = np.sort(fit_sample(values, max_size, seed))
+    n = len(x)
+    if n < 2 or x[0] == x[-1]:
+        raise ValueError("Fitting needs at least two distinct values")
+
+    mean, std = x.mean(), x.std()
+    params, loglik, skipped = {}, {}, {}
+    params["Normal"] = {"mean": mean, "std": std}
+    loglik["Normal"] = -n / 2 * (np.log(2 * np.pi * std ** 2) + 1)
+
+    if x[0] > 0:
+        log_x = np.log(x)
+        sum_log = log_x.sum()
+        k = _gamma_shape(np.log(mean) - sum_log / n)
+        params["Gamma"] = {"shape": k, "scale": mean / k}
+        loglik["Gamma"] = (k - 1) * sum_log - n * k - n * gammaln(k) - n * k * np.log(mean / k)
+        params["Exponential"] = {"mean": mean}
+        loglik["Exponential"] = -n * (np.log(mean) + 1)
+        mu_log, sigma_log = log_x.mean(), log_x.std()
+        params["Lognormal"] = {"mu_log": mu_log, "sigma_log": sigma_log}
+        loglik["Lognormal"] = -n / 2 * (np.log(2 * np.pi * sigma_log ** 2) + 1) - sum_log
+    else:
+        for family in ("Gamma", "Exponential", "Lognormal"):
+            skipped[family] = "needs strictly positive values"
+
+    discretised = bool(np.all(x == np.round(x)))
+    if discretised:
+        support, counts = np.unique(x, return_counts=True)
+        for family in list(params):
+            dist = fitted_distribution(family, params[family])
+            # Upper-tail bins from the survival function to keep precision
+            mass = np.where(support > dist.median(),
+                            dist.sf(support - 0.5) - dist.sf(support + 0.5),
+                            dist.cdf(support + 0.5) - dist.cdf(support - 0.5))
+            loglik[family] = counts @ np.log(np.maximum(mass, np.finfo(float).tiny))
+
+    if x[0] >= 0 and discretised:
+        params["Poisson"] = {"lam": mean}
+        loglik["Poisson"] = (x * np.log(mean)).sum() - n * mean - gammaln(x + 1).sum()
+    else:
+        skipped["Poisson"] = "needs non-negative whole numbers"
+
+    families = [f for f in FIT_FAMILIES if f in params]
+    half = 0.5 if discretised else 0.0
+    dists = [fitted_distribution(f, params[f]) for f in families]
+    cdf_at = np.stack([d.cdf(x) if f == "Poisson" else d.cdf(x + half) for f, d in zip(families, dists)])
+    cdf_before = np.stack([d.cdf(x - 1) if f == "Poisson" else d.cdf(x - half) for f, d in zip(families, dists)])
+    ks = _ks_statistic(x, (cdf_at, cdf_before))
+    n_params = np.array([len(params[f]) for f in families])
+    ll = np.array([loglik[f] for f in families], dtype=float)
+    aic = 2 * n_params - 2 * ll
+
+    ranking = pd.DataFrame({
+        'Distribution': families,
+        'Log_Likelihood': ll,
+        'AIC': aic,
+        'Delta_AIC': aic - aic.min(),
+        'KS_Statistic': ks,
+        'KS_P_Value': stats.kstwo.sf(ks, n),
+    }).sort_values('AIC', kind='stable').reset_index(drop=True)
+    ranking['KS_Rank'] = ranking['KS_Statistic'].rank(method='min').astype(int)
+    params = {f: {name: float(v) for name, v in p.items()} for f, p in params.items()}
+    return DistributionFit(ranking, params, skipped, discretised, n,
+                           int(np.isfinite(np.asarray(values, dtype=float)).sum()))
@@ -0,0 +1,525 @@
+"""Engines for the hypothesis-testing and A/B testing chapter (Chapter 8)."""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from scipy import optimize, special, stats
+
+from array_tools import readonly
+
+PowerGrid = namedtuple("PowerGrid", ["effects", "sample_sizes", "power"])
+
+
+def power_two_proportions(p_a, lift, n_per_arm, alpha=0.05):
+    """Power of a two-sided pooled two-proportion z-test (broadcasts).
+
+    `lift` is relative, so the treatment rate is p_a * (1 + lift).
+    """
+    p_b = p_a * (1 + np.asarray(lift, dtype=float))
+    n = np.asarray(n_per_arm, dtype=float)
+    p_bar = (p_a + p_b) / 2
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    null_se = np.sqrt(2 * p_bar * (1 - p_bar) / n)
+    alt_se = np.sqrt((p_a * (1 - p_a) + p_b * (1 - p_b)) / n)
+    diff = p_b - p_a
+    return (stats.norm.cdf((diff - z_crit * null_se) / alt_se) +
+            stats.norm.cdf((-diff - z_crit * null_se) / alt_se))
+
+
+def required_n_two_proportions(p_a, lift, alpha=0.05, power=0.8):
+    """Visitors per arm for a two-proportion z-test to reach `power`."""
+    p_b = p_a * (1 + np.asarray(lift, dtype=float))
+    p_bar = (p_a + p_b) / 2
+    z_a = stats.norm.ppf(1 - alpha / 2)
+    z_b = stats.norm.ppf(power)
+    with np.errstate(divide="ignore"):
+        n = ((z_a * np.sqrt(2 * p_bar * (1 - p_bar)) +
+              z_b * np.sqrt(p_a * (1 - p_a) + p_b * (1 - p_b))) ** 2 / (p_b - p_a) ** 2)
+    return np.ceil(n)
+
+
+def power_two_sample_t(effect_size, n_per_arm, alpha=0.05):
+    """Power of a two-sided equal-n two-sample t-test via the noncentral t."""
+    d = np.abs(np.asarray(effect_size, dtype=float))
+    n = np.asarray(n_per_arm, dtype=float)
+    df = 2 * n - 2
+    t_crit = stats.t.ppf(1 - alpha / 2, df)
+    noncentrality = d * np.sqrt(n / 2)
+    with np.errstate(invalid="ignore"):
+        upper = stats.nct.sf(t_crit, df, noncentrality)
+        lower = stats.nct.cdf(-t_crit, df, noncentrality)
+    # SciPy's noncentral t can return NaN for very large df; the normal
+    # limit is exact to plotting precision there
+    upper = np.where(np.isnan(upper), stats.norm.sf(t_crit - noncentrality), upper)
+    lower = np.where(np.isnan(lower), stats.norm.cdf(-t_crit - noncentrality), lower)
+    return upper + lower
+
+
+def required_n_two_sample_t(effect_size, alpha=0.05, power=0.8):
+    """Per-group n for a two-sample t-test: normal approximation, then an
+    exact noncentral-t check on a small window of candidates."""
+    z_total = stats.norm.ppf(1 - alpha / 2) + stats.norm.ppf(power)
+    approx = max(2, int(np.floor(2 * (z_total / abs(effect_size)) ** 2)))
+    candidates = np.arange(max(2, approx - 2), approx + 20)
+    meets = np.flatnonzero(power_two_sample_t(effect_size, candidates, alpha) >= power)
+    return int(candidates[meets[0]]) if meets.size else int(candidates[-1])
+
+
+def power_grid(test, baseline, alpha, max_effect, max_n, resolution=200):
+    """Power over an effect-size x sample-size grid in one broadcast.
+
+    For test="proportion" effects are relative lifts on the `baseline`
+    conversion rate; for test="t" they are Cohen's d and `baseline` is
+    ignored (it is left out of the cache key, so every baseline shares
+    one t grid). `power` has shape (len(effects), len(sample_sizes)).
+    """
+    if test != "proportion":
+        baseline = None
+    return _power_grid(test, baseline, alpha, max_effect, max_n, resolution)
+
+
+@lru_cache(maxsize=32)
+def _power_grid(test, baseline, alpha, max_effect, max_n, resolution):
+    effects = np.linspace(max_effect / resolution, max_effect, resolution)
+    sample_sizes = np.unique(np.geomspace(10, max_n, resolution).astype(int))
+    if test == "proportion":
+        power = power_two_proportions(baseline, effects[:, None], sample_sizes[None, :], alpha)
+    else:
+        power = power_two_sample_t(effects[:, None], sample_sizes[None, :], alpha)
+    return PowerGrid(*readonly(effects, sample_sizes, power))
+
+
+SEQUENTIAL_DESIGNS = ("O'Brien-Fleming", "Pocock")
+
+SequentialResult = namedtuple(
+    "SequentialResult",
+    ["looks", "visitors_a", "visitors_b", "z", "p_value", "always_valid_p", "bounds", "stop_look", "decision"],
+)
+
+
+def _crossing_probability(bounds):
+    """P(|Z_k| >= bounds[k] for some k) under H0 with equally spaced looks.
+
+    Recursive numerical integration on the partial-sum scale
+    S_k = sqrt(k) Z_k: the sub-density of S_k on the continuation region is
+    the previous one convolved with a standard normal increment. Each look
+    uses a Simpson grid over its own continuation interval.
+    """
+    points = 401
+    weights = np.ones(points)
+    weights[1:-1:2], weights[2:-1:2] = 4, 2
+    density = grid = prev_weights = None
+    for k, bound in enumerate(bounds, start=1):
+        edge = bound * np.sqrt(k)
+        new_grid = np.linspace(-edge, edge, points)
+        step_weights = weights * (new_grid[1] - new_grid[0]) / 3
+        if density is None:
+            density = stats.norm.pdf(new_grid)
+        else:
+            kernel = stats.norm.pdf(new_grid[:, None] - grid[None, :])
+            density = kernel @ (density * prev_weights)
+        grid, prev_weights = new_grid, step_weights
+    return 1 - float(density @ prev_weights)
+
+
+@lru_cache(maxsize=64)
+def group_sequential_bounds(n_looks, alpha=0.05, design="O'Brien-Fleming"):
+    """Two-sided z boundaries for `n_looks` equally spaced interim analyses.
+
+    O'Brien-Fleming boundaries are c * sqrt(K / k) (very strict early,
+    close to the fixed-sample value at the end); Pocock uses the same c at
+    every look. The constant c is solved so the overall type I error is
+    exactly `alpha`.
+    """
+    if design not in SEQUENTIAL_DESIGNS:
+        raise ValueError(f"Unknown design: {design}")
+    k = np.arange(1, n_looks + 1)
+    shape = np.sqrt(n_looks / k) if design == "O'Brien-Fleming" else np.ones(n_looks)
+    c = optimize.brentq(lambda c: _crossing_probability(c * shape) - alpha,
+                        stats.norm.ppf(1 - alpha / 2) * 0.5, 10.0, xtol=1e-6)
+    return readonly(c * shape)[0]
+
+
+def visitor_stream(p_a, p_b, n_visitors, chunk_size=1_000_000, seed=42):
+    """Yield simulated visitor events in chunks of (is_b, converted) arrays.
+
+    Visitors are split 50/50 at random; nothing beyond the current chunk is
+    kept in memory, so arbitrarily long streams can be consumed.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_visitors, chunk_size):
+        size = min(chunk_size, n_visitors - start)
+        is_b = rng.random(size) < 0.5
+        converted = rng.random(size) < np.where(is_b, p_b, p_a)
+        yield is_b, converted
+
+
+StreamSnapshot = namedtuple(
+    "StreamSnapshot",
+    ["visitors", "visitors_a", "conversions_a", "visitors_b", "conversions_b", "z", "p_value", "ci_low", "ci_high"],
+)
+
+
+def stream_totals(events):
+    """Fold chunks of (is_b, converted) events into running per-arm totals.
+
+    Yields (visitors_a, conversions_a, visitors_b, conversions_b) after
+    every chunk; only the four counts are kept between chunks.
+    """
+    n_a = x_a = n_b = x_b = 0
+    for is_b, converted in events:
+        chunk_b = np.count_nonzero(is_b)
+        conv_b = np.count_nonzero(converted & is_b)
+        n_b += chunk_b
+        x_b += conv_b
+        n_a += len(is_b) - chunk_b
+        x_a += np.count_nonzero(converted) - conv_b
+        yield n_a, x_a, n_b, x_b
+
+
+def stream_ab_test(p_a, p_b, n_visitors, batch_size=100_000, confidence=0.95, seed=42):
+    """Generator pipeline: simulated visitors -> running totals -> test.
+
+    Yields a StreamSnapshot after each batch with the pooled z-statistic,
+    two-sided p-value and Wald interval for p_B - p_A, all computed from
+    the running totals in O(1).
+    """
+    z_ci = stats.norm.ppf(0.5 + confidence / 2)
+    for n_a, x_a, n_b, x_b in stream_totals(visitor_stream(p_a, p_b, n_visitors, batch_size, seed)):
+        rate_a, rate_b = x_a / max(n_a, 1), x_b / max(n_b, 1)
+        pooled = (x_a + x_b) / max(n_a + n_b, 1)
+        se = np.sqrt(pooled * (1 - pooled) * (1 / max(n_a, 1) + 1 / max(n_b, 1)))
+        z = (rate_b - rate_a) / se if se > 0 else 0.0
+        se_diff = np.sqrt(rate_a * (1 - rate_a) / max(n_a, 1) + rate_b * (1 - rate_b) / max(n_b, 1))
+        diff = rate_b - rate_a
+        yield StreamSnapshot(n_a + n_b, n_a, x_a, n_b, x_b, z, 2 * stats.norm.sf(abs(z)),
+                             diff - z_ci * se_diff, diff + z_ci * se_diff)
+
+
+StreamResult = namedtuple("StreamResult", StreamSnapshot._fields + ("visitors_per_second",))
+
+
+@lru_cache(maxsize=16)
+def run_stream_ab_test(p_a, p_b, n_visitors, batch_size=100_000, confidence=0.95, seed=42):
+    """Drain `stream_ab_test` into per-batch arrays (one row per batch, never
+    per visitor) and record the pipeline throughput."""
+    start = time.perf_counter()
+    snapshots = list(stream_ab_test(p_a, p_b, n_visitors, batch_size, confidence, seed))
+    elapsed = time.perf_counter() - start
+    columns = [np.array(column) for column in zip(*snapshots)]
+    return StreamResult(*readonly(*columns), n_visitors / elapsed if elapsed > 0 else np.inf)
+
+
+PeekingResult = namedtuple("PeekingResult", ["visitors", "ever_significant", "significant_at_peek"])
+
+
+@lru_cache(maxsize=16)
+def peeking_error_rates(p, n_visitors, n_peeks, alpha=0.05, replications=5000, seed=42):
+    """False-positive rates of A/A tests that are checked at every peek.
+
+    Each replication splits `n_visitors` evenly over `n_peeks` looks and
+    both arms share the true rate `p`. All replications and peeks come from
+    one binomial draw and a cumulative sum. `ever_significant[k]` is the
+    share of tests that had crossed p < alpha at any look up to k, which is
+    what a team that stops at the first significant result would see.
+    """
+    rng = np.random.default_rng(seed)
+    per_arm = n_visitors // (2 * n_peeks)
+    n = per_arm * np.arange(1, n_peeks + 1)
+    x_a = np.cumsum(rng.binomial(per_arm, p, (replications, n_peeks)), axis=1)
+    x_b = np.cumsum(rng.binomial(per_arm, p, (replications, n_peeks)), axis=1)
+    pooled = (x_a + x_b) / (2 * n)
+    se = np.sqrt(pooled * (1 - pooled) * 2 / n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(se > 0, (x_b - x_a) / n / se, 0.0)
+    significant = 2 * stats.norm.sf(np.abs(z)) < alpha
+    ever = np.logical_or.accumulate(significant, axis=1)
+    return PeekingResult(*readonly(2 * n, ever.mean(axis=0), significant.mean(axis=0)))
+
+
+class SequentialABTest:
+    """Group-sequential two-proportion test fed by a stream of visitor events.
+
+    State is four running counts, so memory is O(1) in the stream length.
+    At each look (a total visitor count in `looks`) the pooled z-statistic is
+    compared against the design boundary, and an always-valid p-value from
+    a normal-mixture sequential probability ratio test is updated alongside
+    the nominal one. Looks after the stopping point are still recorded so
+    the whole path can be plotted; `stop_look` marks where a real test
+    would have ended.
+    """
+
+    def __init__(self, looks, alpha=0.05, design="O'Brien-Fleming", mixture_sd=0.01):
+        self.looks = np.asarray(looks, dtype=np.int64)
+        self.alpha = alpha
+        self.bounds = group_sequential_bounds(len(self.looks), alpha, design)
+        self.mixture_var = mixture_sd ** 2
+        self.seen = self.visitors_b = self.conversions_a = self.conversions_b = 0
+        self.stop_look = None
+        self._next = 0
+        self._always_valid = 1.0
+        self._history = []
+
+    def update(self, is_b, converted):
+        """Consume one chunk of events, evaluating any looks it crosses."""
+        offset = 0
+        size = len(is_b)
+        while offset < size:
+            if self._next < len(self.looks):
+                end = min(size, offset + int(self.looks[self._next] - self.seen))
+            else:
+                end = size
+            seg_b, seg_conv = is_b[offset:end], converted[offset:end]
+            conv_b = np.count_nonzero(seg_conv & seg_b)
+            self.visitors_b += np.count_nonzero(seg_b)
+            self.conversions_b += conv_b
+            self.conversions_a += np.count_nonzero(seg_conv) - conv_b
+            self.seen += end - offset
+            offset = end
+            if self._next < len(self.looks) and self.seen == self.looks[self._next]:
+                self._look()
+
+    def _look(self):
+        n_a, n_b = self.seen - self.visitors_b, self.visitors_b
+        p_a = self.conversions_a / n_a if n_a else 0.0
+        p_b = self.conversions_b / n_b if n_b else 0.0
+        pooled = (self.conversions_a + self.conversions_b) / self.seen
+        se = np.sqrt(pooled * (1 - pooled) * (1 / max(n_a, 1) + 1 / max(n_b, 1)))
+        z = (p_b - p_a) / se if se > 0 else 0.0
+        p_value = 2 * stats.norm.sf(abs(z))
+
+        variance = p_a * (1 - p_a) / max(n_a, 1) + p_b * (1 - p_b) / max(n_b, 1)
+        if variance > 0:
+            total = variance + self.mixture_var
+            log_lr = 0.5 * np.log(variance / total) + self.mixture_var * (p_b - p_a) ** 2 / (2 * variance * total)
+            self._always_valid = min(self._always_valid, float(np.exp(-log_lr)))
+
+        if self.stop_look is None and abs(z) >= self.bounds[self._next]:
+            self.stop_look = self._next
+        self._history.append((n_a, n_b, z, p_value, min(self._always_valid, 1.0)))
+        self._next += 1
+
+    def result(self):
+        history = np.array(self._history, dtype=float).reshape(-1, 5)
+        done = len(history)
+        if self.stop_look is None:
+            decision = "Continue" if done < len(self.looks) else "No difference"
+        else:
+            decision = "B better" if history[self.stop_look, 2] > 0 else "A better"
+        return SequentialResult(
+            *readonly(self.looks[:done], history[:, 0].astype(np.int64), history[:, 1].astype(np.int64),
+                       history[:, 2], history[:, 3], history[:, 4]),
+            self.bounds[:done], self.stop_look, decision,
+        )
+
+
+@lru_cache(maxsize=16)
+def run_sequential_test(p_a, p_b, n_visitors, n_looks, alpha=0.05, design="O'Brien-Fleming",
+                        mixture_sd=0.01, seed=42):
+    """Stream `n_visitors` simulated events through a SequentialABTest with
+    equally spaced looks."""
+    looks = np.linspace(n_visitors / n_looks, n_visitors, n_looks).round().astype(np.int64)
+    test = SequentialABTest(looks, alpha, design, mixture_sd)
+    for is_b, converted in visitor_stream(p_a, p_b, n_visitors, seed=seed):
+        test.update(is_b, converted)
+    return test.result()
+
+
+BayesianABResult = namedtuple(
+    "BayesianABResult",
+    ["posterior_a", "posterior_b", "prob_b_better", "expected_loss_a", "expected_loss_b",
+     "lift_ci", "lift_draws"],
+)
+
+
+def _prob_greater(a1, b1, a2, b2):
+    """Exact P(X1 > X2) for independent X1 ~ Beta(a1, b1), X2 ~ Beta(a2, b2).
+
+    Closed-form finite sum over i < a1 (a1 must be an integer), evaluated as
+    one vectorised logsumexp so it stays cheap for tens of thousands of
+    conversions.
+    """
+    i = np.arange(int(a1))
+    log_terms = (special.betaln(a2 + i, b1 + b2) - np.log(b1 + i)
+                 - special.betaln(1 + i, b1) - special.betaln(a2, b2))
+    return float(np.clip(np.exp(special.logsumexp(log_terms)), 0.0, 1.0))
+
+
+@lru_cache(maxsize=64)
+def bayesian_ab(visitors_a, conversions_a, visitors_b, conversions_b, prior_alpha=1, prior_beta=1,
+                credibility=0.95, n_draws=200_000, seed=42):
+    """Beta-Binomial A/B analysis.
+
+    P(B > A) and the expected loss of shipping either version are exact
+    closed-form sums; the credible interval for the relative lift
+    p_B / p_A - 1 comes from vectorised posterior draws. Prior parameters
+    must be integers (the default is a uniform Beta(1, 1)).
+    """
+    a_a, b_a = prior_alpha + conversions_a, prior_beta + visitors_a - conversions_a
+    a_b, b_b = prior_alpha + conversions_b, prior_beta + visitors_b - conversions_b
+
+    prob_b_better = _prob_greater(a_b, b_b, a_a, b_a)
+    mean_a, mean_b = a_a / (a_a + b_a), a_b / (a_b + b_b)
+    # E[max(p_B - p_A, 0)] = E[p_B 1{p_B > p_A}] - E[p_A 1{p_B > p_A}], where
+    # E[p 1{.}] re-weights that posterior to Beta(a + 1, b)
+    loss_a = mean_b * _prob_greater(a_b + 1, b_b, a_a, b_a) - mean_a * (1 - _prob_greater(a_a + 1, b_a, a_b, b_b))
+    loss_b = loss_a - (mean_b - mean_a)
+
+    rng = np.random.default_rng(seed)
+    lift_draws = rng.beta(a_b, b_b, n_draws) / rng.beta(a_a, b_a, n_draws) - 1
+    tail = (1 - credibility) / 2
+    lift_ci = tuple(np.quantile(lift_draws, [tail, 1 - tail]).tolist())
+
+    return BayesianABResult((a_a, b_a), (a_b, b_b), prob_b_better, max(loss_a, 0.0), max(loss_b, 0.0),
+                            lift_ci, readonly(lift_draws)[0])
+
+
+PERMUTATION_MEMORY_BUDGET = 64 * 2**20  # bytes of subset indices drawn per chunk
+PERMUTATION_PARALLEL_WORK = 100_000_000  # permutations x pooled size before using processes
+
+PermutationResult = namedtuple("PermutationResult", ["observed", "null_diffs", "p_value", "n_permutations"])
+
+
+def _permutation_subset_sums(pooled, m, rows, seed_seq):
+    """Sums of `rows` uniformly random size-m subsets of `pooled`.
+
+    Module level so it can be pickled into worker processes. Each subset
+    comes from Generator.choice without replacement (an unshuffled partial
+    Fisher-Yates draw) and is summed straight away, so no (rows, m) index
+    matrix is held.
+    """
+    rng = np.random.default_rng(seed_seq)
+    sums = np.empty(rows)
+    for row in range(rows):
+        sums[row] = pooled[rng.choice(len(pooled), m, replace=False, shuffle=False)].sum()
+    return sums
+
+
+def permutation_test(sample_a, sample_b, n_permutations=10_000, seed=42,
+                     memory_budget=PERMUTATION_MEMORY_BUDGET, max_workers=None):
+    """Two-sided Monte Carlo permutation test for a difference in means.
+
+    Each permutation relabels the pooled data; only the smaller group's sum
+    is needed, since the other follows from the pooled total. Permutations
+    run in chunks sized to `memory_budget` bytes of subset indices. Chunks are spread over a process pool once the work exceeds
+    PERMUTATION_PARALLEL_WORK (smaller tests run faster in-process), each
+    with its own spawned generator so the result does not depend on the
+    number of workers. The p-value counts the
+    observed labelling as one permutation, so it converges to the exact
+    permutation p-value as `n_permutations` grows.
+    """
+    sample_a = np.asarray(sample_a, dtype=float)
+    sample_b = np.asarray(sample_b, dtype=float)
+    n_a, n_b = len(sample_a), len(sample_b)
+    pooled = np.concatenate([sample_a, sample_b])
+    total = pooled.sum()
+    observed = sample_a.mean() - sample_b.mean()
+
+    m = min(n_a, n_b)
+    chunk = max(1, memory_budget // (m * 8))
+    starts = range(0, n_permutations, chunk)
+    rows = [min(chunk, n_permutations - start) for start in starts]
+    seeds = np.random.SeedSequence(seed).spawn(len(rows))
+
+    workers = min(len(rows), max_workers or os.cpu_count() or 1)
+    if max_workers is None and n_permutations * len(pooled) < PERMUTATION_PARALLEL_WORK:
+        workers = 1
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sums = list(pool.map(_permutation_subset_sums, repeat(pooled), repeat(m), rows, seeds))
+    else:
+        sums = list(map(_permutation_subset_sums, repeat(pooled), repeat(m), rows, seeds))
+    subset = np.concatenate(sums)
+
+    sum_a = subset if m == n_a else total - subset
+    null_diffs = sum_a / n_a - (total - sum_a) / n_b
+    tolerance = 1e-9 * max(abs(observed), np.abs(null_diffs).max())
+    extreme = np.count_nonzero(np.abs(null_diffs) >= abs(observed) - tolerance)
+    p_value = (extreme + 1) / (n_permutations + 1)
+    return PermutationResult(float(observed), readonly(null_diffs)[0], float(p_value), n_permutations)
+
+
+def holm_adjust(p_values):
+    """Holm step-down adjusted p-values (family-wise error control)."""
+    p = np.asarray(p_values, dtype=float)
+    m = len(p)
+    order = np.argsort(p)
+    stepped = np.maximum.accumulate(p[order] * (m - np.arange(m)))
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(stepped, 1.0)
+    return adjusted
+
+
+def bh_adjust(p_values):
+    """Benjamini-Hochberg adjusted p-values (false discovery rate control)."""
+    p = np.asarray(p_values, dtype=float)
+    m = len(p)
+    order = np.argsort(p)
+    scaled = p[order] * m / np.arange(1, m + 1)
+    stepped = np.minimum.accumulate(scaled[::-1])[::-1]
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(stepped, 1.0)
+    return adjusted
+
+
+def abn_test(visitors, conversions, alpha=0.05, names=None):
+    """Compare every variant against the control (index 0) in one pass.
+
+    Pooled two-proportion z-tests for all variants are computed as arrays,
+    then Holm and Benjamini-Hochberg corrections are applied across the
+    family. Returns one row per non-control variant, ranked by conversion
+    rate.
+    """
+    visitors = np.asarray(visitors, dtype=float)
+    conversions = np.asarray(conversions, dtype=float)
+    if names is None:
+        names = np.char.add("Variant ", np.arange(len(visitors)).astype(str))
+    rates = conversions / visitors
+    n_c, x_c, p_c = visitors[0], conversions[0], rates[0]
+    n_v, x_v, p_v = visitors[1:], conversions[1:], rates[1:]
+
+    pooled = (x_c + x_v) / (n_c + n_v)
+    se = np.sqrt(pooled * (1 - pooled) * (1 / n_c + 1 / n_v))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(se > 0, (p_v - p_c) / se, 0.0)
+        lift = (p_v - p_c) / p_c
+    p_values = 2 * stats.norm.sf(np.abs(z))
+    holm = holm_adjust(p_values)
+    bh = bh_adjust(p_values)
+
+    table = pd.DataFrame({
+        'Variant': np.asarray(names)[1:],
+        'Visitors': n_v.astype(np.int64),
+        'Conversions': x_v.astype(np.int64),
+        'Conversion_Rate': p_v,
+        'Lift_vs_Control': lift,
+        'Z': z,
+        'P_Value': p_values,
+        'Holm_P': holm,
+        'BH_Q': bh,
+        'Significant_Raw': p_values < alpha,
+        'Significant_Holm': holm < alpha,
+        'Significant_BH': bh < alpha,
+    })
+    return table.sort_values('Conversion_Rate', ascending=False, kind='stable').reset_index(drop=True)
+
+
+@lru_cache(maxsize=16)
+def simulate_variants(n_variants, visitors_per_variant, base_rate, winner_share, winner_lift, seed=42):
+    """Simulated A/B/n counts: a control plus `n_variants` challengers, of
+    which a `winner_share` fraction truly convert `winner_lift` better.
+
+    Returns (visitors, conversions, is_winner) with the control at index 0.
+    """
+    rng = np.random.default_rng(seed)
+    is_winner = np.zeros(n_variants + 1, dtype=bool)
+    is_winner[1:] = rng.random(n_variants) < winner_share
+    true_rates = np.where(is_winner, base_rate * (1 + winner_lift), base_rate)
+    visitors = np.full(n_variants + 1, visitors_per_variant, dtype=np.int64)
+    conversions = rng.binomial(visitors, true_rates)
+    return readonly(visitors, conversions, is_winner)
@@ -1,3 +1,5 @@
+import time
+
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -6,6 +8,23 @@ import plotly.graph_objects as go
 from scipy import stats
 from sklearn.linear_model import LinearRegression
 
+from dataset_tools import (EXPORT_FORMATS, PAGE_SIZES, export_dataset, get_page, group_aggregates, page_count,
+                           sort_order)
+from decision_analysis import (EMV_INPUTS, PROB_KEYS, DecisionTree, build_exploration_tree, emv_curve,
+                               emv_surface, emv_tornado, launch_emv, simulate_launch)
+from distributions import (DISCRETE_FAMILIES, column_fingerprint, distribution_curve, distribution_curves,
+                           fit_distributions, fitted_distribution, param_values)
+from hypothesis_testing import (SEQUENTIAL_DESIGNS, StreamSnapshot, abn_test, bayesian_ab, peeking_error_rates,
+                                permutation_test, power_grid, power_two_proportions, power_two_sample_t,
+                                required_n_two_proportions, required_n_two_sample_t, run_sequential_test,
+                                run_stream_ab_test, simulate_variants, stream_ab_test)
+from probability import (AGE_GROUPS, BASE_PREMIUM, EVENT_TYPES, FLEET_MEAN_RATES, REFERENCE_RISK, DriverPosteriors,
+                         benchmark_pricing, build_risk_tree, encode_age_groups, score_drivers, simulate_conditional,
+                         simulate_fleet_updates)
+from queueing import required_agent_count, simulate_call_center, staffing_curves
+from relationships import comoments_from_frame, fit_ols, product_batches, rank_correlation_table, rank_correlations
+from sampling import BOOTSTRAP_MAX_DRAWS, bootstrap_ci, poll_coverage
+
 st.set_page_config(page_title="Enterprise Data Analytics", layout="wide")
 
 # Initialize session state
@@ -136,6 +155,251 @@ def render_navigation(current_chapter, chapters):
             if current_index < len(chapters) - 1:
                 st.info(f"Next: {chapters[current_index + 1]} →")
 
+@st.cache_data(max_entries=32)
+def cached_sort_order(dataset_id, column, ascending, _df):
+    """Sort permutation for a cached dataset, computed once per column/direction"""
+    return sort_order(_df[column], ascending)
+
+@st.cache_data(max_entries=32)
+def cached_group_aggregates(dataset_id, group_col, value_cols, _df):
+    """Per-group summaries for a cached dataset, built once so selections are lookups"""
+    return group_aggregates(_df, group_col, list(value_cols))
+
+def render_dataset_viewer(df, key, dataset_id):
+    """Paginated, sortable view that only sends the current page to the browser"""
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_col = st.selectbox("Sort by", ["(original order)"] + list(df.columns), key=f"{key}_sort")
+    with col2:
+        ascending = st.radio("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Ascending"
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    with col4:
+        n_pages = page_count(len(df), page_size)
+        page = st.number_input(f"Page (of {n_pages:,})", 1, n_pages, 1, 1, key=f"{key}_page_{n_pages}")
+
+    order = None
+    if sort_col != "(original order)":
+        order = cached_sort_order(dataset_id, sort_col, ascending, df)
+
+    page_df = get_page(df, page, page_size, order)
+    st.dataframe(page_df)
+    first_row = (page - 1) * page_size + 1
+    st.caption(f"Rows {first_row:,}–{first_row + len(page_df) - 1:,} of {len(df):,}")
+
+@st.cache_data(max_entries=2)
+def cached_export(dataset_id, fmt, _df):
+    """Exported file bytes, built once per dataset and format"""
+    return export_dataset(_df, fmt)
+
+def render_dataset_download(df, key, file_stem, dataset_id):
+    """Format picker plus download button; the file is only built once requested"""
+    fmt = st.selectbox("Download format", list(EXPORT_FORMATS), key=f"{key}_format")
+    extension, mime = EXPORT_FORMATS[fmt]
+    prepared = st.session_state.get(f"{key}_prepared") == (dataset_id, fmt)
+    if not prepared and st.button(f"Prepare {fmt} download", key=f"{key}_prepare"):
+        st.session_state[f"{key}_prepared"] = (dataset_id, fmt)
+        prepared = True
+    if prepared:
+        st.download_button(
+            label=f"Download {fmt}",
+            data=cached_export(dataset_id, fmt, df),
+            file_name=f"{file_stem}.{extension}",
+            mime=mime,
+            key=key
+        )
+
+def decision_tree_figure(tree, result, title, show_labels=True):
+    """Plot a DecisionTree with automatic layout using one trace per element type"""
+    kind, parent, prob, _, _ = tree.arrays()
+    pos = tree.layout()
+    fig = go.Figure()
+
+    # All edges go into two traces (optimal policy vs other), separated by None
+    for on_path, color, width in [(False, '#9ca3af', 1), (True, '#16a34a', 3)]:
+        nodes = np.flatnonzero((parent >= 0) & (result.optimal == on_path))
+        xs = np.column_stack([pos.x[parent[nodes]], pos.x[nodes], np.full(len(nodes), None)]).ravel()
+        ys = np.column_stack([pos.y[parent[nodes]], pos.y[nodes], np.full(len(nodes), None)]).ravel()
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', line=dict(color=color, width=width),
+                                 hoverinfo='skip'))
+
+    for node_kind, symbol, color in [('decision', 'square', 'blue'), ('chance', 'circle', 'orange'),
+                                     ('terminal', 'triangle-left', 'green')]:
+        nodes = np.flatnonzero(kind == node_kind)
+        labels = [f"{tree.label[n]}<br>${result.values[n]:,.0f}" +
+                  (f" ({prob[n]:.0%})" if parent[n] >= 0 and kind[parent[n]] == 'chance' else "")
+                  for n in nodes]
+        fig.add_trace(go.Scatter(x=pos.x[nodes], y=pos.y[nodes], mode='markers+text' if show_labels else 'markers',
+                                 marker=dict(size=14 if show_labels else 5, color=color, symbol=symbol),
+                                 text=labels if show_labels else None, textposition='top center',
+                                 hovertext=labels, hoverinfo='text'))
+
+    fig.update_layout(
+        title=title,
+        showlegend=False,
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-0.5, pos.x.max() + 1]),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        height=400
+    )
+    return fig
+
+def probability_tree_figure(tree, title, highlight=None, show_labels=True):
+    """Plot a ProbabilityTree as one edge trace, one edge-label trace and one node trace"""
+    _, parent, prob, _, _ = tree.arrays()
+    pos = tree.layout()
+    joint = tree.joint()
+    labels = np.array(tree.label, dtype=object)
+    fig = go.Figure()
+
+    marked = tree.path_contains(highlight) if highlight is not None else np.zeros(len(tree), dtype=bool)
+    for on_path, color, width in [(False, '#9ca3af', 1), (True, '#dc2626', 3)]:
+        nodes = np.flatnonzero((parent >= 0) & (marked == on_path))
+        xs = np.column_stack([pos.x[parent[nodes]], pos.x[nodes], np.full(len(nodes), None)]).ravel()
+        ys = np.column_stack([pos.y[parent[nodes]], pos.y[nodes], np.full(len(nodes), None)]).ravel()
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', line=dict(color=color, width=width), hoverinfo='skip'))
+
+    if show_labels:
+        edges = np.flatnonzero(parent >= 0)
+        fig.add_trace(go.Scatter(x=(pos.x[parent[edges]] + pos.x[edges]) / 2, y=(pos.y[parent[edges]] + pos.y[edges]) / 2,
+                                 mode='text', text=[f"{p:.1%}" for p in prob[edges]], textfont=dict(size=10, color='gray'),
+                                 hoverinfo='skip'))
+
+    hover = [f"{label}<br>P(branch) = {p:.2%}<br>P(path) = {j:.3%}" for label, p, j in zip(labels, prob, joint)]
+    fig.add_trace(go.Scatter(x=pos.x, y=pos.y, mode='markers+text' if show_labels else 'markers',
+                             marker=dict(size=12 if show_labels else 6, color=joint, colorscale='Blues',
+                                         cmin=0, cmax=1, line=dict(width=1, color='black')),
+                             text=labels if show_labels else None, textposition='top center',
+                             hovertext=hover, hoverinfo='text'))
+
+    fig.update_layout(
+        title=title,
+        showlegend=False,
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-0.5, pos.x.max() + 0.5]),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        height=max(400, min(1200, 14 * int(tree.is_leaf().sum())))
+    )
+    return fig
+
+@st.cache_data(max_entries=32)
+def cached_ols(dataset_id, target, numeric, categorical, _df):
+    return fit_ols(_df, target, numeric, categorical)
+
+@st.cache_data(max_entries=8)
+def cached_bootstrap(sample, statistic, n_resamples, confidence):
+    return bootstrap_ci(sample, statistic, n_resamples, confidence)
+
+@st.cache_data(max_entries=8)
+def cached_permutation_test(sample_a, sample_b, n_permutations):
+    return permutation_test(sample_a, sample_b, n_permutations)
+
+@st.cache_data(max_entries=32)
+def cached_distribution_fit(fingerprint, _values):
+    """MLE fits for one column, computed once per column fingerprint"""
+    return fit_distributions(_values)
+
+PARAM_LABELS = {"mean": "μ", "std": "σ", "shape": "k", "scale": "θ", "mu_log": "μ_log", "sigma_log": "σ_log", "lam": "λ"}
+
+def render_distribution_fit(values, fingerprint, value_label):
+    """Ranking table and fitted densities over a histogram of the column"""
+    fit = cached_distribution_fit(fingerprint, values)
+    ranking = fit.ranking.copy()
+    ranking.insert(1, 'Parameters', [", ".join(f"{PARAM_LABELS[k]}={v:.3g}" for k, v in fit.params[f].items())
+                                     for f in ranking['Distribution']])
+
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        fig = go.Figure(go.Histogram(x=values, histnorm='probability density', nbinsx=40, name='Data',
+                                     marker_color='lightgray'))
+        grid = np.linspace(np.nanmin(values), np.nanmax(values), 400)
+        for family in ranking['Distribution']:
+            dist = fitted_distribution(family, fit.params[family])
+            if family == "Poisson":
+                support = np.arange(np.floor(grid[0]), np.ceil(grid[-1]) + 1)
+                fig.add_trace(go.Scatter(x=support, y=dist.pmf(support), mode='lines+markers', name=family))
+            else:
+                fig.add_trace(go.Scatter(x=grid, y=dist.pdf(grid), mode='lines', name=family))
+        fig.update_layout(title='Fitted Distributions', xaxis_title=value_label, yaxis_title='Density')
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        st.dataframe(ranking.set_index('Distribution').style.format({
+            'Log_Likelihood': '{:,.1f}', 'AIC': '{:,.1f}', 'Delta_AIC': '{:,.1f}', 'KS_Statistic': '{:.4f}',
+            'KS_P_Value': '{:.3g}'}), use_container_width=True)
+        if fit.skipped:
+            st.caption("Not fitted: " + "; ".join(f"{f} ({reason})" for f, reason in fit.skipped.items()))
+        if fit.discretised:
+            st.caption("Whole-number data: continuous fits are scored on unit bins around each value, so their AIC is comparable with the Poisson PMF.")
+        if fit.n_used < fit.n_total:
+            st.caption(f"Fitted on a random subsample of {fit.n_used:,} of {fit.n_total:,} values.")
+
+    best, closest = ranking.iloc[0], ranking.loc[ranking['KS_Rank'].idxmin()]
+    st.markdown(f'<div class="insight">Lowest AIC: <strong>{best["Distribution"]}</strong> ({best["Parameters"]}). Closest CDF by KS distance: <strong>{closest["Distribution"]}</strong> (D = {closest["KS_Statistic"]:.3f}). AIC rewards likelihood and penalises extra parameters; KS measures the largest gap between the fitted and observed CDFs.</div>', unsafe_allow_html=True)
+
+def render_stream_frame(frame, history, sig_level):
+    with frame.container():
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Visitors Streamed", f"{history.visitors[-1]:,}")
+        col2.metric("z-statistic", f"{history.z[-1]:.3f}")
+        col3.metric("p-value", f"{history.p_value[-1]:.4f}")
+        col4.metric(f"{1 - sig_level:.0%} CI (B - A)",
+                    f"[{history.ci_low[-1] * 100:+.2f}, {history.ci_high[-1] * 100:+.2f}] pp")
+        p_fig, ci_fig = stream_trajectory_figures(history, sig_level)
+        col1, col2 = st.columns(2)
+        col1.plotly_chart(p_fig, use_container_width=True)
+        col2.plotly_chart(ci_fig, use_container_width=True)
+
+def stream_trajectory_figures(history, sig_level):
+    p_fig = go.Figure()
+    p_fig.add_trace(go.Scatter(x=history.visitors, y=history.p_value, mode='lines', name='p-value'))
+    p_fig.add_hline(y=sig_level, line_dash="dash", line_color="red", annotation_text=f"α = {sig_level}")
+    p_fig.update_layout(title='p-value as Visitors Arrive', xaxis_title='Visitors', yaxis_title='p-value', yaxis_type='log')
+
+    ci_fig = go.Figure()
+    ci_fig.add_trace(go.Scatter(x=history.visitors, y=history.ci_high * 100, mode='lines', line=dict(width=0),
+                                showlegend=False))
+    ci_fig.add_trace(go.Scatter(x=history.visitors, y=history.ci_low * 100, mode='lines', line=dict(width=0),
+                                fill='tonexty', fillcolor='rgba(0, 100, 255, 0.2)', name='CI'))
+    ci_fig.add_trace(go.Scatter(x=history.visitors, y=(history.ci_low + history.ci_high) / 2 * 100, mode='lines',
+                                name='Difference', line=dict(color='blue')))
+    ci_fig.add_hline(y=0, line_dash="dash", line_color="black")
+    ci_fig.update_layout(title='Difference (B - A) with Confidence Interval', xaxis_title='Visitors',
+                         yaxis_title='Difference (pp)')
+    return p_fig, ci_fig
+
+@st.cache_data(max_entries=8)
+def make_netflix_data(num_users, skew_factor):
+    np.random.seed(42)
+    return pd.DataFrame({
+        'Hours': np.random.gamma(skew_factor, 3, num_users),
+        'Type': np.random.choice(['Series', 'Movie', 'Doc'], num_users, p=[0.6, 0.3, 0.1]),
+        'Device': np.random.choice(['TV', 'Mobile', 'Desktop'], num_users, p=[0.5, 0.35, 0.15]),
+        'Rating': np.random.choice([1,2,3,4,5], num_users, p=[0.05,0.1,0.2,0.35,0.3])
+    })
+
+@st.cache_data(max_entries=8)
+def make_uber_data(num_rides, mean_duration, skew_level):
+    np.random.seed(42)
+    return pd.DataFrame({
+        'Duration': np.random.gamma(skew_level, mean_duration/skew_level, num_rides),
+        'Distance': np.random.gamma(2, 5, num_rides),
+        'Time_of_Day': np.random.choice(['Morning', 'Afternoon', 'Evening', 'Night'], num_rides)
+    })
+
+@st.cache_data(max_entries=8)
+def make_amazon_data(num_products, price_rating_corr):
+    np.random.seed(42)
+    price = np.random.uniform(10, 200, num_products)
+    rating = 5 - (price_rating_corr * (price - price.mean()) / price.std() +
+                 np.random.normal(0, 0.5, num_products))
+    rating = np.clip(rating, 1, 5)
+    reviews = np.random.poisson(50, num_products) + (rating - 3) * 20
+
+    return pd.DataFrame({
+        'Price': price,
+        'Rating': rating,
+        'Reviews': reviews,
+        'Category': np.random.choice(['Electronics', 'Books', 'Home', 'Clothing'], num_products)
+    })
+
 # Styling
 st.markdown("""
 <style>
@@ -333,13 +597,7 @@ The Cleveland Clinic reduced 30-day readmission rates from 19.6% to 15.4% using:
         with col2:
             skew_factor = st.slider("Skewness Factor", 1.0, 5.0, 2.0, 0.5)
 
-        np.random.seed(42)
-        netflix = pd.DataFrame({
-            'Hours': np.random.gamma(skew_factor, 3, num_users),
-            'Type': np.random.choice(['Series', 'Movie', 'Doc'], num_users, p=[0.6, 0.3, 0.1]),
-            'Device': np.random.choice(['TV', 'Mobile', 'Desktop'], num_users, p=[0.5, 0.35, 0.15]),
-            'Rating': np.random.choice([1,2,3,4,5], num_users, p=[0.05,0.1,0.2,0.35,0.3])
-        })
+        netflix = make_netflix_data(num_users, skew_factor)
 
         col1, col2 = st.columns(2)
         with col1:
@@ -363,30 +621,29 @@ The Cleveland Clinic reduced 30-day readmission rates from 19.6% to 15.4% using:
         st.markdown('<div class="insight">Mean > Median indicates right skew. Netflix uses MEDIAN for subscriber metrics to avoid bias from binge-watchers.</div>', unsafe_allow_html=True)
 
         st.markdown("### Interactive Data Type Explorer")
-        selected_type = st.selectbox("Select Content Type", ['All'] + list(netflix['Type'].unique()))
+        dataset_id = ("netflix", num_users, skew_factor)
+        type_stats = cached_group_aggregates(dataset_id, 'Type', ('Hours',), netflix)
+        selected_type = st.selectbox("Select Content Type", ['All'] + list(type_stats.index))
 
         if selected_type != 'All':
-            filtered = netflix[netflix['Type'] == selected_type]
+            group = type_stats.loc[selected_type]
             col1, col2, col3 = st.columns(3)
-            col1.metric(f"{selected_type} Mean", f"{filtered['Hours'].mean():.2f}h")
-            col2.metric(f"{selected_type} Median", f"{filtered['Hours'].median():.2f}h")
-            col3.metric(f"{selected_type} Count", len(filtered))
+            col1.metric(f"{selected_type} Mean", f"{group['Hours_mean']:.2f}h")
+            col2.metric(f"{selected_type} Median", f"{group['Hours_median']:.2f}h")
+            col3.metric(f"{selected_type} Count", int(group['count']))
+
+        st.markdown("### Which Distribution Fits Watch Time?")
+        render_distribution_fit(netflix['Hours'].to_numpy(), dataset_id + ('Hours',), 'Hours')
 
         # Dataset View/Download
         st.markdown("### Dataset")
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.checkbox("View Dataset", key="view_ch1_netflix"):
-                st.dataframe(netflix.head(10))
+            view_dataset = st.checkbox("View Dataset", key="view_ch1_netflix")
         with col2:
-            csv = netflix.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="netflix_data.csv",
-                mime="text/csv",
-                key="download_ch1_netflix"
-            )
+            render_dataset_download(netflix, "download_ch1_netflix", "netflix_data", dataset_id)
+        if view_dataset:
+            render_dataset_viewer(netflix, "view_ch1_netflix", dataset_id)
 
     with tab3:
         st.markdown("### Flashcards")
@@ -519,15 +776,16 @@ elif "2." in chapter:
 
         sample_size = st.slider("Sample Size", 100, 5000, 1000, 100)
 
+        rng = np.random.default_rng(42)
         if dist_type == "Normal":
-            data = np.random.normal(50, 15, sample_size)
+            data = rng.normal(50, 15, sample_size)
         elif dist_type == "Right-Skewed":
-            data = np.random.gamma(2, 10, sample_size)
+            data = rng.gamma(2, 10, sample_size)
         elif dist_type == "Left-Skewed":
-            data = 100 - np.random.gamma(2, 10, sample_size)
+            data = 100 - rng.gamma(2, 10, sample_size)
         else:  # Bimodal
-            data = np.concatenate([np.random.normal(30, 5, sample_size//2),
-                                  np.random.normal(70, 5, sample_size//2)])
+            data = np.concatenate([rng.normal(30, 5, sample_size//2),
+                                  rng.normal(70, 5, sample_size//2)])
 
         col1, col2 = st.columns(2)
         with col1:
@@ -545,6 +803,9 @@ elif "2." in chapter:
         col3.metric("Skewness", f"{stats.skew(data):.2f}")
         col4.metric("Kurtosis", f"{stats.kurtosis(data):.2f}")
 
+        st.markdown("#### Which Distribution Fits?")
+        render_distribution_fit(data, column_fingerprint(data), 'Value')
+
     with tab2:
         st.markdown('<div class="example-box"><h3>Uber Ride Duration Analysis</h3><p>Analyzing millions of rides to optimize driver allocation and pricing</p></div>', unsafe_allow_html=True)
 
@@ -574,12 +835,7 @@ UPS's On-Road Integrated Optimization and Navigation (ORION) system uses distrib
         with col3:
             skew_level = st.slider("Skewness Level", 1, 5, 2, 1)
 
-        np.random.seed(42)
-        uber = pd.DataFrame({
-            'Duration': np.random.gamma(skew_level, mean_duration/skew_level, num_rides),
-            'Distance': np.random.gamma(2, 5, num_rides),
-            'Time_of_Day': np.random.choice(['Morning', 'Afternoon', 'Evening', 'Night'], num_rides)
-        })
+        uber = make_uber_data(num_rides, mean_duration, skew_level)
 
         # Calculate outliers
         Q1 = uber['Duration'].quantile(0.25)
@@ -611,21 +867,19 @@ UPS's On-Road Integrated Optimization and Navigation (ORION) system uses distrib
         if st.checkbox("Show Outlier Details"):
             st.dataframe(outliers[['Duration', 'Distance', 'Time_of_Day']].head(10))
 
+        dataset_id = ("uber", num_rides, mean_duration, skew_level)
+        st.markdown("### Which Distribution Fits Ride Durations?")
+        render_distribution_fit(uber['Duration'].to_numpy(), dataset_id + ('Duration',), 'Duration (min)')
+
         # Dataset View/Download
         st.markdown("### Dataset")
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.checkbox("View Dataset", key="view_ch2_uber"):
-                st.dataframe(uber.head(10))
+            view_dataset = st.checkbox("View Dataset", key="view_ch2_uber")
         with col2:
-            csv = uber.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="uber_data.csv",
-                mime="text/csv",
-                key="download_ch2_uber"
-            )
+            render_dataset_download(uber, "download_ch2_uber", "uber_data", dataset_id)
+        if view_dataset:
+            render_dataset_viewer(uber, "view_ch2_uber", dataset_id)
 
     with tab3:
         st.markdown("### Flashcards")
@@ -771,11 +1025,19 @@ elif "3." in chapter:
         with col2:
             sample_size = st.slider("Number of Points", 50, 500, 200, 50)
 
-        noise_level = st.slider("Noise Level", 0.0, 2.0, 0.5, 0.1)
+        col1, col2 = st.columns(2)
+        with col1:
+            noise_level = st.slider("Noise Level", 0.0, 2.0, 0.5, 0.1)
+        with col2:
+            n_outliers = st.slider("Outliers", 0, 20, 0, 1, help="Extreme points placed against the trend")
 
         np.random.seed(42)
         x = np.random.normal(0, 1, sample_size)
         y = correlation_strength * x + np.random.normal(0, noise_level, sample_size)
+        if n_outliers:
+            direction = 1 if correlation_strength >= 0 else -1
+            x[:n_outliers] = np.random.uniform(3, 4, n_outliers)
+            y[:n_outliers] = -direction * np.random.uniform(4, 6, n_outliers)
 
         df = pd.DataFrame({'X': x, 'Y': y})
 
@@ -783,10 +1045,10 @@ elif "3." in chapter:
         actual_corr = np.corrcoef(x, y)[0, 1]
 
         # Linear regression
-        from numpy.polynomial import Polynomial
-        p = Polynomial.fit(df['X'], df['Y'], 1)
+        trend = cached_ols(("correlation_demo", correlation_strength, sample_size, noise_level, n_outliers),
+                           'Y', ('X',), (), df)
         line_x = np.array([df['X'].min(), df['X'].max()])
-        line_y = p(line_x)
+        line_y = trend.coef[0] + trend.coef[1] * line_x
 
         fig = px.scatter(df, x='X', y='Y', title=f'Interactive Correlation (r = {actual_corr:.3f})')
         fig.add_scatter(x=line_x, y=line_y, mode='lines', name='Regression Line',
@@ -805,6 +1067,17 @@ elif "3." in chapter:
             strength_label = "Strong"
         col3.metric("Strength", strength_label)
 
+        # Rank-based measures next to Pearson
+        ranks = rank_correlations(x, y)
+        col1, col2 = st.columns(2)
+        col1.metric("Spearman ρ", f"{ranks.spearman:.3f}", delta=f"{ranks.spearman - actual_corr:+.3f} vs Pearson r", delta_color="off")
+        col2.metric("Kendall τ-b", f"{ranks.kendall_tau_b:.3f}", delta=f"{ranks.kendall_tau_b - actual_corr:+.3f} vs Pearson r", delta_color="off")
+
+        if n_outliers:
+            st.markdown(f'<div class="insight">{n_outliers} outliers move Pearson r to {actual_corr:.3f}, because it uses the raw values. The rank-based measures only see each outlier as one more mis-ordered point: Spearman ρ = {ranks.spearman:.3f}, Kendall τ-b = {ranks.kendall_tau_b:.3f}.</div>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<div class="insight">Without outliers, Pearson r and Spearman ρ are close. Kendall τ-b is usually smaller in magnitude because it measures the share of concordant minus discordant pairs. Add outliers to see Pearson r react far more than the rank measures.</div>', unsafe_allow_html=True)
+
     with tab2:
         st.markdown('<div class="example-box"><h3>Amazon Product Rating Analysis</h3><p>Analyzing correlation between price, ratings, and reviews for millions of products</p></div>', unsafe_allow_html=True)
 
@@ -832,30 +1105,20 @@ Spotify uses correlation and regression analysis for personalized recommendation
         with col2:
             price_rating_corr = st.slider("Price-Rating Correlation", -0.8, 0.8, -0.3, 0.1)
 
-        np.random.seed(42)
-        price = np.random.uniform(10, 200, num_products)
-        rating = 5 - (price_rating_corr * (price - price.mean()) / price.std() +
-                     np.random.normal(0, 0.5, num_products))
-        rating = np.clip(rating, 1, 5)
-        reviews = np.random.poisson(50, num_products) + (rating - 3) * 20
-
-        amazon = pd.DataFrame({
-            'Price': price,
-            'Rating': rating,
-            'Reviews': reviews,
-            'Category': np.random.choice(['Electronics', 'Books', 'Home', 'Clothing'], num_products)
-        })
+        amazon = make_amazon_data(num_products, price_rating_corr)
+        dataset_id = ("amazon", num_products, price_rating_corr)
 
-        # Calculate correlations
-        corr_price_rating = amazon['Price'].corr(amazon['Rating'])
-        corr_rating_reviews = amazon['Rating'].corr(amazon['Reviews'])
+        # Calculate correlations (streaming co-moments over all numeric columns)
+        moments = comoments_from_frame(amazon)
+        corr_matrix = pd.DataFrame(moments.correlation(), index=moments.columns, columns=moments.columns)
+        corr_price_rating = corr_matrix.loc['Price', 'Rating']
+        corr_rating_reviews = corr_matrix.loc['Rating', 'Reviews']
 
         col1, col2 = st.columns(2)
         with col1:
-            from numpy.polynomial import Polynomial
-            p = Polynomial.fit(amazon['Price'], amazon['Rating'], 1)
+            trend = cached_ols(dataset_id, 'Rating', ('Price',), (), amazon)
             line_x = np.array([amazon['Price'].min(), amazon['Price'].max()])
-            line_y = p(line_x)
+            line_y = trend.coef[0] + trend.coef[1] * line_x
 
             fig = px.scatter(amazon, x='Price', y='Rating', title='Price vs Rating',
                            color='Category', opacity=0.6)
@@ -863,9 +1126,9 @@ Spotify uses correlation and regression analysis for personalized recommendation
                           line=dict(color='red', width=2))
             st.plotly_chart(fig, use_container_width=True)
         with col2:
-            p2 = Polynomial.fit(amazon['Rating'], amazon['Reviews'], 1)
+            trend2 = cached_ols(dataset_id, 'Reviews', ('Rating',), (), amazon)
             line_x2 = np.array([amazon['Rating'].min(), amazon['Rating'].max()])
-            line_y2 = p2(line_x2)
+            line_y2 = trend2.coef[0] + trend2.coef[1] * line_x2
 
             fig = px.scatter(amazon, x='Rating', y='Reviews', title='Rating vs Reviews',
                            color='Category', opacity=0.6)
@@ -880,31 +1143,97 @@ Spotify uses correlation and regression analysis for personalized recommendation
 
         st.markdown(f'<div class="insight">Price and rating show {"negative" if corr_price_rating < 0 else "positive"} correlation (r = {corr_price_rating:.3f}). Higher-rated products tend to attract more reviews (r = {corr_rating_reviews:.3f}).</div>', unsafe_allow_html=True)
 
+        st.markdown("### Correlation Matrix")
+        fig = px.imshow(corr_matrix, text_auto='.3f', color_continuous_scale='RdBu_r', zmin=-1, zmax=1,
+                        title='Correlation Across All Numeric Columns')
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown("#### Linear vs Rank Correlation")
+        rank_table = rank_correlation_table(amazon, [('Price', 'Rating'), ('Rating', 'Reviews'), ('Price', 'Reviews')])
+        st.dataframe(rank_table.style.format('{:.3f}'), use_container_width=True)
+        st.caption("Ratings are clipped at 1 and 5, so many products tie at the top. Spearman and Kendall τ-b handle these ties through ranks, and they capture monotonic relationships that are not linear.")
+
+        st.markdown("#### Streaming Appends")
+        st.markdown("The matrix is built from running co-moments, so new products can be appended in chunks without recomputing from scratch.")
+        stream_key = (num_products, price_rating_corr)
+        if st.session_state.get("amazon_stream_key") != stream_key:
+            st.session_state.amazon_stream_key = stream_key
+            st.session_state.amazon_stream = comoments_from_frame(amazon)
+            st.session_state.amazon_stream_batches = 0
+            st.session_state.amazon_stream_seconds = None
+
+        col1, col2, col3 = st.columns(3)
+        append_rows = 0
+        if col1.button("Append 1M Products", key="amazon_append_1m"):
+            append_rows = 1_000_000
+        if col2.button("Append 10M Products", key="amazon_append_10m"):
+            append_rows = 10_000_000
+        if col3.button("Reset to Dataset", key="amazon_stream_reset"):
+            st.session_state.amazon_stream = comoments_from_frame(amazon)
+            st.session_state.amazon_stream_batches = 0
+            st.session_state.amazon_stream_seconds = None
+        if append_rows:
+            start_time = time.perf_counter()
+            for block in product_batches(append_rows, price_rating_corr, seed=st.session_state.amazon_stream_batches):
+                st.session_state.amazon_stream.update(block)
+            st.session_state.amazon_stream_batches += 1
+            st.session_state.amazon_stream_seconds = time.perf_counter() - start_time
+
+        streamed = st.session_state.amazon_stream
+        streamed_corr = streamed.correlation()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Products in Matrix", f"{streamed.count:,}")
+        col2.metric("Price-Rating r", f"{streamed_corr[0, 1]:.3f}", delta=f"{streamed_corr[0, 1] - corr_price_rating:+.3f} vs dataset", delta_color="off")
+        last_append = st.session_state.amazon_stream_seconds
+        col3.metric("Last Append", f"{last_append:.2f} s" if last_append is not None else "—")
+
+        st.markdown("### Multiple Regression: What Drives Rating?")
+        st.markdown("One model with price, review count and product category (relative to the first category) as predictors of rating.")
+        ols = cached_ols(dataset_id, 'Rating', ('Price', 'Reviews'), ('Category',), amazon)
+        ols_table = pd.DataFrame({'Coefficient': ols.coef, 'Std_Error': ols.std_err, 't': ols.t_stat,
+                                  'p_Value': ols.p_value}, index=ols.names)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("R²", f"{ols.r_squared:.3f}")
+        col2.metric("Adjusted R²", f"{ols.adj_r_squared:.3f}")
+        col3.metric("Residual Std Error", f"{ols.resid_std:.3f}")
+
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            st.dataframe(ols_table.style.format({'Coefficient': '{:.4f}', 'Std_Error': '{:.4f}', 't': '{:.2f}',
+                                                 'p_Value': '{:.4f}'}), use_container_width=True)
+        with col2:
+            predictors = ols_table.drop(index='Intercept')
+            fig = go.Figure(go.Scatter(x=predictors['Coefficient'], y=predictors.index, mode='markers',
+                                       error_x=dict(type='data', array=1.96 * predictors['Std_Error']),
+                                       marker=dict(size=10, color=np.where(predictors['p_Value'] < 0.05, 'green', 'gray'))))
+            fig.add_vline(x=0, line_dash="dash", line_color="black")
+            fig.update_layout(title='Coefficients with 95% CI', xaxis_title='Effect on Rating', height=300)
+            st.plotly_chart(fig, use_container_width=True)
+
+        significant = [name for name in predictors.index if predictors.loc[name, 'p_Value'] < 0.05]
+        st.markdown(f'<div class="insight">Together the predictors explain {ols.r_squared:.1%} of the variation in ratings. Significant at 5%: {", ".join(significant) if significant else "none"}. Each coefficient is the change in rating for one unit of that predictor, holding the others fixed.</div>', unsafe_allow_html=True)
+
         st.markdown("### Category Breakdown")
-        selected_category = st.selectbox("Select Category", ['All'] + list(amazon['Category'].unique()))
+        category_stats = cached_group_aggregates(dataset_id, 'Category', ('Price', 'Rating'), amazon)
+        selected_category = st.selectbox("Select Category", ['All'] + list(category_stats.index))
 
         if selected_category != 'All':
-            cat_data = amazon[amazon['Category'] == selected_category]
+            group = category_stats.loc[selected_category]
             col1, col2, col3 = st.columns(3)
-            col1.metric(f"{selected_category} Avg Price", f"${cat_data['Price'].mean():.2f}")
-            col2.metric(f"{selected_category} Avg Rating", f"{cat_data['Rating'].mean():.2f}")
-            col3.metric(f"{selected_category} Products", len(cat_data))
+            col1.metric(f"{selected_category} Avg Price", f"${group['Price_mean']:.2f}")
+            col2.metric(f"{selected_category} Avg Rating", f"{group['Rating_mean']:.2f}")
+            col3.metric(f"{selected_category} Products", int(group['count']))
 
         # Dataset View/Download
         st.markdown("### Dataset")
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.checkbox("View Dataset", key="view_ch3_amazon"):
-                st.dataframe(amazon.head(10))
+            view_dataset = st.checkbox("View Dataset", key="view_ch3_amazon")
         with col2:
-            csv = amazon.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="amazon_data.csv",
-                mime="text/csv",
-                key="download_ch3_amazon"
-            )
+            render_dataset_download(amazon, "download_ch3_amazon", "amazon_data", dataset_id)
+        if view_dataset:
+            render_dataset_viewer(amazon, "view_ch3_amazon", dataset_id)
 
     with tab3:
         st.markdown("### Flashcards")
@@ -1049,6 +1378,44 @@ elif "4." in chapter:
 
             st.markdown(f'<div class="insight">Given B occurred, the probability of A is {p_a_given_b:.1%}. Events are {"independent" if abs(p_a_given_b - p_a) < 0.01 else "dependent"}.</div>', unsafe_allow_html=True)
 
+            # Monte Carlo check of the formulas
+            st.markdown("**Monte Carlo Check**")
+            if 1 - p_a - p_b + p_a_and_b < -1e-12:
+                st.warning("These probabilities are inconsistent: P(A or B) would exceed 1. Raise P(A and B) to simulate.")
+            else:
+                mc_draws = st.select_slider("Simulated Pairs", options=[100_000, 1_000_000, 10_000_000, 20_000_000],
+                                            value=10_000_000, format_func=lambda v: f"{v:,}", key="cond_mc_draws")
+                mc = simulate_conditional(p_a, p_b, p_a_and_b, mc_draws)
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig = go.Figure()
+                    fig.add_trace(go.Scatter(x=mc.draws, y=mc.p_a_given_b, mode='lines', name='Empirical P(A|B)',
+                                             line=dict(color='blue')))
+                    fig.add_trace(go.Scatter(x=mc.draws, y=mc.p_b_given_a, mode='lines', name='Empirical P(B|A)',
+                                             line=dict(color='red')))
+                    fig.add_hline(y=p_a_given_b, line_dash="dash", line_color="blue", annotation_text="Formula P(A|B)")
+                    if p_a > 0:
+                        fig.add_hline(y=p_b_given_a, line_dash="dash", line_color="red", annotation_text="Formula P(B|A)")
+                    fig.update_layout(title='Convergence to the Formula', xaxis_title='Simulated Pairs',
+                                    yaxis_title='Probability', xaxis_type='log', yaxis_range=[0, 1.05])
+                    st.plotly_chart(fig, use_container_width=True)
+                with col2:
+                    error = np.abs(mc.p_a_given_b - p_a_given_b)
+                    fig = go.Figure()
+                    fig.add_trace(go.Scatter(x=mc.draws, y=error, mode='lines', name='|Empirical - Formula|'))
+                    fig.add_trace(go.Scatter(x=mc.draws, y=np.sqrt(p_a_given_b * (1 - p_a_given_b) / (mc.draws * p_b)),
+                                             mode='lines', name='Standard Error', line=dict(dash='dash')))
+                    fig.update_layout(title='Error in P(A|B) Shrinks Like 1/√n', xaxis_title='Simulated Pairs',
+                                    yaxis_title='Absolute Error', xaxis_type='log', yaxis_type='log')
+                    st.plotly_chart(fig, use_container_width=True)
+
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Simulated P(A|B)", f"{mc.p_a_given_b[-1]:.4f}", delta=f"{mc.p_a_given_b[-1] - p_a_given_b:+.4f}", delta_color="off")
+                col2.metric("Simulated P(B|A)", f"{mc.p_b_given_a[-1]:.4f}" if p_a > 0 else "—",
+                            delta=f"{mc.p_b_given_a[-1] - p_b_given_a:+.4f}" if p_a > 0 else None, delta_color="off")
+                col3.metric("Simulated P(A and B)", f"{mc.joint[0, 0]:.4f}", delta=f"{mc.joint[0, 0] - p_a_and_b:+.4f}", delta_color="off")
+
     with tab2:
         st.markdown('<div class="example-box"><h3>Tesla Insurance Risk Assessment</h3><p>Using probability to calculate insurance premiums based on driver behavior</p></div>', unsafe_allow_html=True)
 
@@ -1079,111 +1446,150 @@ elif "4." in chapter:
             st.markdown("**Behavior Factors**")
             speeding_freq = st.slider("Speeding Events/Month", 0, 20, 5, 1)
             hard_brake_freq = st.slider("Hard Braking Events/Month", 0, 30, 10, 1)
+        col1, col2 = st.columns(2)
+        with col1:
+            months_observed = st.slider("Months of Telematics Data", 1, 24, 6, 1)
+        with col2:
+            accidents_observed = st.slider("Accidents in That Period", 0, 3, 0, 1)
+
+        # Calculate risk probabilities with the same engine that scores the fleet
+        age_code = encode_age_groups([age_group])[0]
+        driver = score_drivers(age_code, driving_score, speeding_freq, hard_brake_freq)
+        base_risk = float(driver.base_risk)
+        accident_risk = float(driver.accident_risk)
+
+        # Bayes' update: fleet-wide priors on event rates, updated with this driver's telematics
+        posterior = DriverPosteriors([age_code], [driving_score])
+        prior_risk = float(posterior.posterior_risk()[0])
+        observed_events = np.array([speeding_freq, hard_brake_freq]) * months_observed
+        posterior.observe_events(np.zeros(observed_events.sum(), dtype=np.int32),
+                                 np.repeat(np.arange(len(EVENT_TYPES)), observed_events))
+        posterior.observe_exposure(months_observed)
+        posterior.observe_accidents(np.zeros(accidents_observed, dtype=np.intp))
+        posterior_risk = float(posterior.posterior_risk()[0])
+        risk_alpha, risk_beta = posterior.accident_posterior()
+        risk_ci = stats.beta.ppf([0.025, 0.975], risk_alpha[0], risk_beta[0])
 
-        # Calculate risk probabilities
-        age_risk = {"16-25": 0.15, "26-40": 0.08, "41-60": 0.06, "60+": 0.10}
-        base_risk = age_risk[age_group]
-
-        behavior_factor = 1 + (speeding_freq * 0.02) + (hard_brake_freq * 0.01)
-        score_factor = (100 - driving_score) / 100
-
-        accident_risk = base_risk * behavior_factor * (1 + score_factor)
-        accident_risk = min(accident_risk, 0.95)
-
-        # Bayes' update simulation
-        prior_risk = base_risk
-        evidence_factor = behavior_factor * (1 + score_factor)
-        posterior_risk = accident_risk
-
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Base Risk (Age)", f"{prior_risk:.1%}")
-        col2.metric("Updated Risk (Behavior)", f"{posterior_risk:.1%}")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Prior Risk (Fleet Average)", f"{prior_risk:.1%}")
+        col2.metric("Posterior Risk (Telematics)", f"{posterior_risk:.1%}")
         risk_increase = ((posterior_risk - prior_risk) / prior_risk * 100) if prior_risk > 0 else 0
         col3.metric("Risk Change", f"{risk_increase:+.0f}%")
+        col4.metric("95% Credible Interval", f"[{risk_ci[0]:.1%}, {risk_ci[1]:.1%}]")
+
+        rate_means = posterior.rate_means()[:, 0]
+        rate_low, rate_high = (bound[:, 0] for bound in posterior.rate_intervals())
+        st.caption(f"Posterior monthly rates: speeding {rate_means[0]:.1f} (95% CI {rate_low[0]:.1f}–{rate_high[0]:.1f}), "
+                   f"hard braking {rate_means[1]:.1f} (95% CI {rate_low[1]:.1f}–{rate_high[1]:.1f}) "
+                   f"(observed {speeding_freq} and {hard_brake_freq}; fleet averages {FLEET_MEAN_RATES[0]:.1f} and "
+                   f"{FLEET_MEAN_RATES[1]:.1f}). Taking the observed rates at face value would give {accident_risk:.1%}.")
 
         # Calculate premium
-        base_premium = 1200
-        premium = base_premium * (posterior_risk / 0.08)
+        premium = BASE_PREMIUM * posterior_risk / REFERENCE_RISK
 
-        st.markdown(f'<div class="insight">Your estimated annual premium: <strong>${premium:.2f}</strong>. This is based on conditional probability P(Accident|Behavior) using Bayes theorem to update from base risk.</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="insight">Your estimated annual premium: <strong>${premium:.2f}</strong>. This is based on the posterior P(Accident|Behavior): Bayes\' theorem updates the fleet-average prior with {months_observed} months of this driver\'s telematics.</div>', unsafe_allow_html=True)
 
         # Probability tree visualization
         st.markdown("### Probability Tree")
 
-        # Tree now updates dynamically based on slider inputs
-        fig = go.Figure()
-
-        # Level 1: Age
-        fig.add_trace(go.Scatter(
-            x=[0, 1], y=[1, 1],
-            mode='lines+text',
-            text=['', f'Age ({age_group}): {prior_risk:.1%}'],
-            textposition='middle right',
-            line=dict(color='blue', width=2)
-        ))
-
-        # Level 2: With risky behavior (uses actual calculated posterior_risk)
-        fig.add_trace(go.Scatter(
-            x=[1, 2], y=[1, 1.2],
-            mode='lines+text',
-            text=['', f'+ Risky Behavior: {posterior_risk:.1%}'],
-            textposition='middle right',
-            line=dict(color='red', width=2)
-        ))
+        col1, col2 = st.columns(2)
+        with col1:
+            risky_share = st.slider("Share of Drivers with Your Behavior", 0.05, 0.95, 0.3, 0.05, key="tree_risky_share")
+        with col2:
+            score_bands = st.select_slider("Driving Score Bands", options=[1, 2, 5, 10], value=1, key="tree_score_bands",
+                                           help="1 uses your driving score; more bands add a level covering the whole fleet")
+        risk_tree = build_risk_tree(driving_score, speeding_freq, hard_brake_freq, risky_share, score_bands)
+        tree_marginals = risk_tree.marginals()
 
-        # Level 2: Safe behavior (dynamically calculated)
-        safe_risk = prior_risk * 0.5
-        fig.add_trace(go.Scatter(
-            x=[1, 2], y=[1, 0.8],
-            mode='lines+text',
-            text=['', f'+ Safe Behavior: {safe_risk:.1%}'],
-            textposition='middle right',
-            line=dict(color='green', width=2)
-        ))
+        col1, col2, col3 = st.columns(3)
+        col1.metric("P(Accident)", f"{tree_marginals['Accident']:.1%}")
+        col2.metric(f"P(Accident | Age {age_group})", f"{risk_tree.conditional('Accident', f'Age {age_group}'):.1%}")
+        col3.metric("P(Your Behavior | Accident)", f"{risk_tree.conditional('Risky Behavior', 'Accident'):.1%}")
 
-        fig.update_layout(
-            title=f'Risk Probability Tree (Score: {driving_score}, Speeding: {speeding_freq}/mo, Braking: {hard_brake_freq}/mo)',
-            showlegend=False,
-            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            height=300
-        )
+        st.plotly_chart(probability_tree_figure(
+            risk_tree,
+            f'Risk Probability Tree (Score: {driving_score}, Speeding: {speeding_freq}/mo, Braking: {hard_brake_freq}/mo)',
+            highlight=f'Age {age_group}', show_labels=len(risk_tree) <= 40
+        ), use_container_width=True)
 
-        st.plotly_chart(fig, use_container_width=True)
+        st.markdown(f'<div class="insight">Multiplying conditional probabilities along each path gives joint probabilities. Summing the accident leaves gives P(Accident) = {tree_marginals["Accident"]:.1%}. Bayes\' theorem reverses the tree: among drivers who have an accident, {risk_tree.conditional("Risky Behavior", "Accident"):.0%} drive like you, compared with {risky_share:.0%} of all drivers.</div>', unsafe_allow_html=True)
 
         # Create sample dataset for Tesla insurance
         np.random.seed(42)
         num_drivers = 100
         tesla_data = pd.DataFrame({
             'Driver_ID': range(1, num_drivers + 1),
-            'Age_Group': np.random.choice(['16-25', '26-40', '41-60', '60+'], num_drivers),
+            'Age_Group': pd.Categorical(np.random.choice(AGE_GROUPS, num_drivers), categories=AGE_GROUPS),
             'Driving_Score': np.random.randint(50, 100, num_drivers),
             'Speeding_Events_Per_Month': np.random.randint(0, 20, num_drivers),
             'Hard_Braking_Events_Per_Month': np.random.randint(0, 30, num_drivers)
         })
         # Calculate risk for each driver
-        age_risk_map = {"16-25": 0.15, "26-40": 0.08, "41-60": 0.06, "60+": 0.10}
-        tesla_data['Base_Risk'] = tesla_data['Age_Group'].map(age_risk_map)
-        tesla_data['Behavior_Factor'] = 1 + (tesla_data['Speeding_Events_Per_Month'] * 0.02) + (tesla_data['Hard_Braking_Events_Per_Month'] * 0.01)
-        tesla_data['Score_Factor'] = (100 - tesla_data['Driving_Score']) / 100
-        tesla_data['Accident_Risk'] = (tesla_data['Base_Risk'] * tesla_data['Behavior_Factor'] * (1 + tesla_data['Score_Factor'])).clip(upper=0.95)
-        tesla_data['Annual_Premium'] = (1200 * (tesla_data['Accident_Risk'] / 0.08)).round(2)
+        scores = score_drivers(encode_age_groups(tesla_data['Age_Group']), tesla_data['Driving_Score'].to_numpy(),
+                               tesla_data['Speeding_Events_Per_Month'].to_numpy(),
+                               tesla_data['Hard_Braking_Events_Per_Month'].to_numpy())
+        tesla_data['Base_Risk'] = scores.base_risk
+        tesla_data['Behavior_Factor'] = scores.behavior_factor
+        tesla_data['Score_Factor'] = scores.score_factor
+        tesla_data['Accident_Risk'] = scores.accident_risk
+        tesla_data['Annual_Premium'] = scores.annual_premium.round(2)
+
+        # Batch pricing throughput
+        st.markdown("### Fleet Pricing at Scale")
+        st.markdown("The calculator above and the dataset below share one vectorized scoring engine. The batch API prices entire fleets from compact arrays.")
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            fleet_size = st.select_slider("Fleet Size", options=[100_000, 1_000_000, 10_000_000], value=10_000_000,
+                                          format_func=lambda v: f"{v:,}", key="fleet_size")
+            run_benchmark = st.button("Run Pricing Benchmark", key="fleet_benchmark")
+        if run_benchmark:
+            seconds, throughput = benchmark_pricing(fleet_size)
+            with col2:
+                col_a, col_b = st.columns(2)
+                col_a.metric("Time to Price Fleet", f"{seconds * 1000:.0f} ms")
+                col_b.metric("Throughput", f"{throughput / 1e6:,.1f}M drivers/s")
+
+        # Fleet-wide posterior updating from streamed telematics
+        st.markdown("### Fleet Posterior Updating")
+        st.markdown("Every driver starts from the fleet-wide prior. Each month of streamed speeding and hard-braking events updates all drivers' posteriors in one batched pass.")
+        col1, col2 = st.columns(2)
+        with col1:
+            update_fleet = st.select_slider("Fleet Size", options=[10_000, 100_000, 200_000], value=100_000,
+                                            format_func=lambda v: f"{v:,}", key="posterior_fleet")
+        with col2:
+            update_months = st.slider("Months Streamed", 1, 24, 12, key="posterior_months")
+        updates = simulate_fleet_updates(update_fleet, update_months)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=updates.months, y=updates.posterior_rmse, mode='lines+markers', name='Posterior Mean'))
+            fig.add_trace(go.Scatter(x=updates.months, y=updates.raw_rmse, mode='lines+markers', name='Raw Average (Events / Months)'))
+            fig.update_layout(title='Error in Estimated Event Rates', xaxis_title='Months of Data',
+                            yaxis_title='RMSE (events/month)')
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            edges = np.linspace(0, np.quantile(updates.true_risk, 0.995), 60)
+            centers = (edges[:-1] + edges[1:]) / 2 * 100
+            fig = go.Figure()
+            for label, values in [("Prior", updates.prior_risk), ("Posterior", updates.posterior_risk), ("True", updates.true_risk)]:
+                fig.add_trace(go.Bar(x=centers, y=np.histogram(values, bins=edges)[0], name=label, opacity=0.6))
+            fig.update_layout(title='Driver Risk Distribution', barmode='overlay', bargap=0,
+                            xaxis_title='Annual Accident Risk (%)', yaxis_title='Drivers')
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f'<div class="insight">After {update_months} months, the posterior rate estimates have RMSE {updates.posterior_rmse[-1]:.2f} events/month versus {updates.raw_rmse[-1]:.2f} for raw averages. Shrinking toward the fleet prior helps most when data is scarce. Posterior risks spread out from the prior toward each driver\'s true risk.</div>', unsafe_allow_html=True)
 
         # Dataset View/Download
+        dataset_id = ("tesla", num_drivers)
         st.markdown("### Dataset")
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.checkbox("View Dataset", key="view_ch4_tesla"):
-                st.dataframe(tesla_data.head(10))
+            view_dataset = st.checkbox("View Dataset", key="view_ch4_tesla")
         with col2:
-            csv = tesla_data.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="tesla_data.csv",
-                mime="text/csv",
-                key="download_ch4_tesla"
-            )
+            render_dataset_download(tesla_data, "download_ch4_tesla", "tesla_data", dataset_id)
+        if view_dataset:
+            render_dataset_viewer(tesla_data, "view_ch4_tesla", dataset_id)
 
     with tab3:
         st.markdown("### Flashcards")
@@ -1312,6 +1718,9 @@ elif "5." in chapter:
 
         dist_choice = st.selectbox("Select Distribution",
                                    ["Normal", "Binomial", "Poisson", "Exponential"])
+        show_cdf = st.radio("Curve", ["Density (PDF/PMF)", "Cumulative (CDF)"],
+                            horizontal=True, key="dist_curve_kind") == "Cumulative (CDF)"
+        y_label = 'Cumulative Probability' if show_cdf else None
 
         if dist_choice == "Normal":
             col1, col2 = st.columns(2)
@@ -1319,17 +1728,18 @@ elif "5." in chapter:
                 mean = st.slider("Mean (μ)", -10.0, 10.0, 0.0, 0.5)
             with col2:
                 std = st.slider("Standard Deviation (σ)", 0.5, 5.0, 1.0, 0.5)
+            overlay_vary, overlay_fixed = ("std", "σ", [0.5, 1.0, 2.0]), {"mean": mean}
 
-            x = np.linspace(mean - 4*std, mean + 4*std, 1000)
-            y = stats.norm.pdf(x, mean, std)
+            curve = distribution_curve("Normal", mean=mean, std=std)
 
             fig = go.Figure()
-            fig.add_trace(go.Scatter(x=x, y=y, fill='tozeroy', name='PDF'))
+            fig.add_trace(go.Scatter(x=curve.x, y=curve.cdf if show_cdf else curve.density,
+                                     fill='tozeroy', name='CDF' if show_cdf else 'PDF'))
             fig.add_vline(x=mean, line_dash="dash", annotation_text="Mean")
             fig.add_vline(x=mean+std, line_dash="dot", annotation_text="+1σ")
             fig.add_vline(x=mean-std, line_dash="dot", annotation_text="-1σ")
             fig.update_layout(title=f'Normal Distribution (μ={mean}, σ={std})',
-                            xaxis_title='Value', yaxis_title='Probability Density')
+                            xaxis_title='Value', yaxis_title=y_label or 'Probability Density')
             st.plotly_chart(fig, use_container_width=True)
 
             st.markdown(f"""
@@ -1345,12 +1755,13 @@ elif "5." in chapter:
                 n_trials = st.slider("Number of Trials (n)", 1, 50, 20, 1)
             with col2:
                 prob = st.slider("Success Probability (p)", 0.0, 1.0, 0.5, 0.05)
+            overlay_vary, overlay_fixed = ("p", "p", [0.2, 0.5, 0.8]), {"n": n_trials}
 
-            x = np.arange(0, n_trials + 1)
-            y = stats.binom.pmf(x, n_trials, prob)
+            curve = distribution_curve("Binomial", n=n_trials, p=prob)
 
-            fig = px.bar(x=x, y=y, title=f'Binomial Distribution (n={n_trials}, p={prob})',
-                        labels={'x': 'Number of Successes', 'y': 'Probability'})
+            fig = px.bar(x=curve.x, y=curve.cdf if show_cdf else curve.density,
+                        title=f'Binomial Distribution (n={n_trials}, p={prob})',
+                        labels={'x': 'Number of Successes', 'y': y_label or 'Probability'})
             st.plotly_chart(fig, use_container_width=True)
 
             expected_value = n_trials * prob
@@ -1362,12 +1773,13 @@ elif "5." in chapter:
 
         elif dist_choice == "Poisson":
             lambda_val = st.slider("Average Rate (λ)", 0.5, 20.0, 5.0, 0.5)
+            overlay_vary, overlay_fixed = ("lam", "λ", [1.0, 5.0, 10.0]), {}
 
-            x = np.arange(0, int(lambda_val * 3) + 10)
-            y = stats.poisson.pmf(x, lambda_val)
+            curve = distribution_curve("Poisson", lam=lambda_val)
 
-            fig = px.bar(x=x, y=y, title=f'Poisson Distribution (λ={lambda_val})',
-                        labels={'x': 'Number of Events', 'y': 'Probability'})
+            fig = px.bar(x=curve.x, y=curve.cdf if show_cdf else curve.density,
+                        title=f'Poisson Distribution (λ={lambda_val})',
+                        labels={'x': 'Number of Events', 'y': y_label or 'Probability'})
             st.plotly_chart(fig, use_container_width=True)
 
             st.markdown(f"""
@@ -1380,14 +1792,15 @@ elif "5." in chapter:
 
         else:  # Exponential
             lambda_val = st.slider("Rate Parameter (λ)", 0.1, 5.0, 1.0, 0.1)
+            overlay_vary, overlay_fixed = ("lam", "λ", [0.5, 1.0, 2.0]), {}
 
-            x = np.linspace(0, 10/lambda_val, 1000)
-            y = stats.expon.pdf(x, scale=1/lambda_val)
+            curve = distribution_curve("Exponential", lam=lambda_val)
 
             fig = go.Figure()
-            fig.add_trace(go.Scatter(x=x, y=y, fill='tozeroy', name='PDF'))
+            fig.add_trace(go.Scatter(x=curve.x, y=curve.cdf if show_cdf else curve.density,
+                                     fill='tozeroy', name='CDF' if show_cdf else 'PDF'))
             fig.update_layout(title=f'Exponential Distribution (λ={lambda_val})',
-                            xaxis_title='Time', yaxis_title='Probability Density')
+                            xaxis_title='Time', yaxis_title=y_label or 'Probability Density')
             st.plotly_chart(fig, use_container_width=True)
 
             mean_time = 1 / lambda_val
@@ -1397,6 +1810,29 @@ elif "5." in chapter:
             - Memoryless property: P(X > s+t | X > s) = P(X > t)
             """)
 
+        st.markdown("#### Overlay Comparison")
+        if st.checkbox("Overlay several settings", key="dist_overlay"):
+            vary, symbol, default = overlay_vary
+            values = st.multiselect(f"Values of {symbol} to compare",
+                                    param_values(dist_choice, vary).tolist(), default=default,
+                                    key=f"dist_overlay_{dist_choice}")
+            if values:
+                values = sorted(values)
+                curves = distribution_curves(dist_choice, **{vary: values}, **overlay_fixed)
+                discrete = dist_choice in DISCRETE_FAMILIES
+                fig = go.Figure()
+                for value, x, y in zip(values, curves.x, curves.cdf if show_cdf else curves.density):
+                    fig.add_trace(go.Scatter(x=x, y=y, name=f"{symbol} = {value:g}",
+                                             mode='lines+markers' if discrete else 'lines',
+                                             line_shape='hv' if discrete and show_cdf else 'linear'))
+                fixed_text = ", ".join(f"{name} = {value:g}" for name, value in overlay_fixed.items())
+                fig.update_layout(title=f'{dist_choice} Distribution, Varying {symbol}' + (f' ({fixed_text})' if fixed_text else ''),
+                                  xaxis_title='Value',
+                                  yaxis_title=y_label or ('Probability' if discrete else 'Probability Density'))
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info(f"Pick at least one value of {symbol} to compare.")
+
     with tab2:
         st.markdown('<div class="example-box"><h3>Call Center Operations</h3><p>Using statistical distributions to optimize staffing and service levels</p></div>', unsafe_allow_html=True)
 
@@ -1461,15 +1897,93 @@ American Express uses statistical distributions for real-time fraud detection:
 
         # Staffing calculator
         st.markdown("### Staffing Calculator")
-        service_level_target = st.slider("Target Service Level (%)", 80, 99, 95, 1)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            service_level_target = st.slider("Target Service Level (%)", 80, 99, 95, 1)
+        with col2:
+            answer_target = st.slider("Answer Within (seconds)", 5, 120, 20, 5)
+        with col3:
+            aht_minutes = st.slider("Average Handle Time (min)", 1.0, 15.0, 4.0, 0.5)
 
-        # Simple staffing formula (Erlang C approximation)
-        calls_per_agent = 15  # assumption
-        required_agents = int(np.ceil(avg_calls_per_hour / calls_per_agent * (100 / service_level_target)))
+        # Exact Erlang C (M/M/N queue), cached per (λ, AHT, answer target)
+        curves = staffing_curves(avg_calls_per_hour, aht_minutes, answer_target)
+        required_agents = required_agent_count(avg_calls_per_hour, aht_minutes, answer_target,
+                                               service_level_target / 100)
+        idx = required_agents - 1
 
-        col1, col2 = st.columns(2)
+        col1, col2, col3, col4 = st.columns(4)
         col1.metric("Recommended Agents", required_agents)
         col2.metric("Calls per Agent", f"{avg_calls_per_hour / required_agents:.1f}")
+        col3.metric("Probability of Waiting", f"{curves.prob_wait[idx]:.1%}")
+        col4.metric("Avg Speed of Answer", f"{curves.asa_seconds[idx]:.1f} s")
+
+        offered_load = avg_calls_per_hour * aht_minutes / 60
+        shown = curves.agents > offered_load
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=curves.agents[shown], y=curves.service_level[shown] * 100,
+                                     mode='lines+markers', name='Service Level'))
+            fig.add_trace(go.Scatter(x=curves.agents[shown], y=curves.prob_wait[shown] * 100,
+                                     mode='lines', name='P(Wait)', line=dict(dash='dot')))
+            fig.add_hline(y=service_level_target, line_dash="dash", line_color="red",
+                         annotation_text="Target")
+            fig.add_vline(x=required_agents, line_dash="dot", line_color="green",
+                         annotation_text="Recommended")
+            fig.update_layout(title=f'Service Level ({answer_target}s) vs Agents',
+                            xaxis_title='Agents', yaxis_title='%')
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = px.line(x=curves.agents[shown], y=curves.asa_seconds[shown], markers=True,
+                         title='Average Speed of Answer vs Agents',
+                         labels={'x': 'Agents', 'y': 'ASA (seconds)'}, log_y=True)
+            fig.add_vline(x=required_agents, line_dash="dot", line_color="green",
+                         annotation_text="Recommended")
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f'<div class="insight">Offered load: {offered_load:.1f} Erlangs. With {required_agents} agents (occupancy {curves.occupancy[idx]:.0%}), {curves.service_level[idx]:.1%} of calls are answered within {answer_target} seconds.</div>', unsafe_allow_html=True)
+
+        # Discrete-event queue simulation
+        st.markdown("### Queue Simulation")
+        st.markdown("Simulate full days of arrivals, waiting and service with impatient callers.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sim_agents = st.slider("Agents on Shift", 1, required_agents * 2, required_agents, 1)
+        with col2:
+            patience_minutes = st.slider("Average Caller Patience (min)", 0.5, 10.0, 3.0, 0.5)
+        with col3:
+            replications = st.select_slider("Simulated Days", options=[100, 250, 500, 1000], value=250)
+
+        sim = simulate_call_center(avg_calls_per_hour, aht_minutes, sim_agents, simulation_hours,
+                                   patience_minutes, answer_target, replications)
+        day_service_level = sim.answered_in_target / np.maximum(sim.arrivals, 1)
+        abandon_rate = sim.abandoned.sum() / sim.arrivals.sum()
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(f"Answered in {answer_target}s", f"{day_service_level.mean():.1%}")
+        col2.metric("Abandonment Rate", f"{abandon_rate:.1%}")
+        col3.metric("Avg Wait (answered)", f"{np.nanmean(sim.mean_wait) * 60:.1f} s")
+        col4.metric("Agent Utilization", f"{sim.utilization.mean():.1%}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            counts, edges = np.histogram(sim.waits * 60, bins=40)
+            fig = px.bar(x=edges[:-1], y=counts / max(counts.sum(), 1),
+                        title='Waiting Time Distribution (answered calls)',
+                        labels={'x': 'Wait (seconds)', 'y': 'Share of Calls'})
+            fig.add_vline(x=answer_target, line_dash="dash", line_color="red",
+                         annotation_text="Answer Target")
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = px.histogram(x=day_service_level * 100, nbins=30,
+                             title=f'Daily Service Level across {replications} Days',
+                             labels={'x': f'% Answered within {answer_target}s'})
+            fig.add_vline(x=service_level_target, line_dash="dash", line_color="red",
+                         annotation_text="Target")
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f'<div class="insight">Across {replications} simulated {simulation_hours}-hour days with {sim_agents} agents, {np.mean(day_service_level >= service_level_target / 100):.0%} of days met the {service_level_target}% target. Erlang C ignores abandonment, so impatient callers make the real queue look shorter than the formula predicts.</div>', unsafe_allow_html=True)
 
         # Create sample dataset for Call Center
         call_center_data = pd.DataFrame({
@@ -1479,21 +1993,16 @@ American Express uses statistical distributions for real-time fraud detection:
             'Variance_From_Expected': calls_per_hour - avg_calls_per_hour
         })
 
-        # Dataset View/Download
+        # Dataset View/Download; the hourly counts are unseeded draws, so they are part of the ID
+        dataset_id = ("call_center", avg_calls_per_hour, simulation_hours, tuple(calls_per_hour.tolist()))
         st.markdown("### Dataset")
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.checkbox("View Dataset", key="view_ch5_callcenter"):
-                st.dataframe(call_center_data.head(10))
+            view_dataset = st.checkbox("View Dataset", key="view_ch5_callcenter")
         with col2:
-            csv = call_center_data.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="call_center_data.csv",
-                mime="text/csv",
-                key="download_ch5_callcenter"
-            )
+            render_dataset_download(call_center_data, "download_ch5_callcenter", "call_center_data", dataset_id)
+        if view_dataset:
+            render_dataset_viewer(call_center_data, "view_ch5_callcenter", dataset_id)
 
     with tab3:
         st.markdown("### Flashcards")
@@ -1620,54 +2129,15 @@ elif "6." in chapter:
         emv = success_prob * success_return + (1 - success_prob) * failure_return
         net_emv = emv - investment_amount
 
-        # Create decision tree visualization
-        fig = go.Figure()
-
-        # Decision node
-        fig.add_trace(go.Scatter(
-            x=[0], y=[0],
-            mode='markers+text',
-            marker=dict(size=20, color='blue', symbol='square'),
-            text=['Invest?'],
-            textposition='top center'
-        ))
-
-        # Chance node
-        fig.add_trace(go.Scatter(
-            x=[1, 1], y=[0.5, -0.5],
-            mode='markers',
-            marker=dict(size=15, color='orange', symbol='circle')
-        ))
-
-        # Outcomes
-        fig.add_trace(go.Scatter(
-            x=[2, 2], y=[0.5, -0.5],
-            mode='markers+text',
-            marker=dict(size=10, color='green'),
-            text=[f'Success<br>${success_return:,}', f'Failure<br>${failure_return:,}'],
-            textposition='middle right'
-        ))
-
-        # Lines
-        fig.add_trace(go.Scatter(x=[0, 1], y=[0, 0.5], mode='lines', line=dict(color='black')))
-        fig.add_trace(go.Scatter(x=[0, 1], y=[0, -0.5], mode='lines', line=dict(color='black')))
-        fig.add_trace(go.Scatter(x=[1, 2], y=[0.5, 0.5], mode='lines+text',
-                                line=dict(color='black'),
-                                text=[f'{success_prob:.0%}', ''],
-                                textposition='top center'))
-        fig.add_trace(go.Scatter(x=[1, 2], y=[-0.5, -0.5], mode='lines+text',
-                                line=dict(color='black'),
-                                text=[f'{1-success_prob:.0%}', ''],
-                                textposition='bottom center'))
-
-        fig.update_layout(
-            title='Decision Tree',
-            showlegend=False,
-            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, range=[-0.5, 3]),
-            yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-            height=400
-        )
+        # Build and roll back the decision tree
+        invest_tree = DecisionTree()
+        root = invest_tree.decision('Invest?')
+        invest = invest_tree.chance('Invest', root, payoff=-investment_amount)
+        invest_tree.terminal('Success', invest, success_prob, success_return)
+        invest_tree.terminal('Failure', invest, 1 - success_prob, failure_return)
+        invest_tree.terminal('Do Not Invest', root)
 
+        fig = decision_tree_figure(invest_tree, invest_tree.rollback(), 'Decision Tree')
         st.plotly_chart(fig, use_container_width=True)
 
         col1, col2, col3 = st.columns(3)
@@ -1768,17 +2238,69 @@ ExxonMobil uses decision analysis for multi-billion dollar exploration projects:
         else:
             st.markdown(f'<div class="insight">Decision: DO NOT LAUNCH. Expected loss: ${abs(emv_launch):,.0f}. The expected value is negative.</div>', unsafe_allow_html=True)
 
+        # Monte Carlo risk analysis
+        st.markdown("### Monte Carlo Risk Analysis")
+        st.markdown("Treat revenues, costs and scenario probabilities as uncertain and simulate the full profit distribution.")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            revenue_cv = st.slider("Revenue Uncertainty (±%)", 0, 100, 30, 5) / 100
+        with col2:
+            cost_cv = st.slider("Cost Uncertainty (±%)", 0, 50, 15, 5) / 100
+        with col3:
+            prob_confidence = st.select_slider("Confidence in Probabilities",
+                                               options=["Low", "Medium", "High", "Certain"], value="Medium")
+        with col4:
+            n_draws = st.select_slider("Simulated Outcomes", options=[100_000, 500_000, 1_000_000, 2_000_000],
+                                       value=1_000_000, format_func=lambda n: f"{n:,}")
+
+        concentration = {"Low": 10.0, "Medium": 50.0, "High": 200.0, "Certain": 1e9}[prob_confidence]
+        mc = simulate_launch(dev_cost, marketing_cost, (revenue_high, revenue_moderate, revenue_low),
+                             (prob_success, prob_moderate, prob_failure), revenue_cv, cost_cv,
+                             concentration, n_draws)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Mean Profit", f"${mc.mean:,.0f}", delta=f"σ = ${mc.std:,.0f}", delta_color="off")
+        col2.metric("Probability of Loss", f"{mc.prob_loss:.1%}")
+        col3.metric("95% VaR", f"${mc.var:,.0f}")
+        col4.metric("95% CVaR", f"${mc.cvar:,.0f}")
+
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            counts, edges = np.histogram(mc.profits, bins=80)
+            fig = go.Figure()
+            fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts / n_draws,
+                                 marker_color=np.where(edges[:-1] < 0, '#ef4444', '#10b981')))
+            fig.add_vline(x=mc.mean, line_dash="dash", annotation_text="Mean")
+            fig.add_vline(x=-mc.var, line_dash="dot", line_color="red", annotation_text="95% VaR")
+            fig.update_layout(title=f'Profit Distribution ({n_draws:,} simulated launches)',
+                            xaxis_title='Profit ($)', yaxis_title='Probability', showlegend=False)
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            st.dataframe(pd.DataFrame({
+                'Percentile': [f"P{p}" for p in mc.percentiles],
+                'Profit ($)': [f"{v:,.0f}" for v in mc.percentiles.values()]
+            }), hide_index=True, use_container_width=True)
+
+        st.markdown(f'<div class="insight">The point-estimate EMV is ${emv_launch:,.0f}, but in {mc.prob_loss:.0%} of simulated launches the product loses money. In the worst 5% of outcomes the average loss is ${mc.cvar:,.0f}.</div>', unsafe_allow_html=True)
+
         # Sensitivity analysis
         st.markdown("### Sensitivity Analysis")
         st.markdown("How does changing success probability affect EMV?")
 
+        emv_inputs = {
+            'prob_success': prob_success, 'prob_moderate': prob_moderate, 'prob_failure': prob_failure,
+            'revenue_high': revenue_high, 'revenue_moderate': revenue_moderate, 'revenue_low': revenue_low,
+            'dev_cost': dev_cost, 'marketing_cost': marketing_cost
+        }
+        input_labels = {
+            'prob_success': 'P(High Success)', 'prob_moderate': 'P(Moderate)', 'prob_failure': 'P(Failure)',
+            'revenue_high': 'Revenue: High', 'revenue_moderate': 'Revenue: Moderate',
+            'revenue_low': 'Revenue: Failure', 'dev_cost': 'Development Cost', 'marketing_cost': 'Marketing Cost'
+        }
+
         prob_range = np.linspace(0, 1-prob_failure, 50)
-        emv_range = []
-        for p in prob_range:
-            emv = (p * profit_high +
-                  (1 - prob_failure - p) * profit_moderate +
-                  prob_failure * profit_low)
-            emv_range.append(emv)
+        emv_range = emv_curve(emv_inputs, 'prob_success', prob_range)
 
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=prob_range, y=emv_range, mode='lines', name='EMV'))
@@ -1790,6 +2312,97 @@ ExxonMobil uses decision analysis for multi-billion dollar exploration projects:
                          yaxis_title='Expected Profit ($)')
         st.plotly_chart(fig, use_container_width=True)
 
+        st.markdown("#### Two-Parameter Sensitivity Surface")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            x_input = st.selectbox("X-axis Input", EMV_INPUTS, index=0,
+                                   format_func=input_labels.get, key="surface_x")
+        with col2:
+            y_input = st.selectbox("Y-axis Input", [n for n in EMV_INPUTS if n != x_input], index=1,
+                                   format_func=input_labels.get, key="surface_y")
+        with col3:
+            resolution = st.select_slider("Grid Resolution", options=[100, 250, 500, 1000], value=250)
+
+        # Probabilities span [0, 1]; money inputs span 0 to twice the current value
+        input_ranges = {name: (0.0, 1.0) if name in PROB_KEYS else (0.0, max(2.0 * value, 1.0))
+                        for name, value in emv_inputs.items()}
+        x_vals, y_vals, emv_grid = emv_surface(emv_inputs, x_input, input_ranges[x_input],
+                                               y_input, input_ranges[y_input], resolution)
+        # The browser only needs ~250 cells per axis; finer grids are thinned for display
+        step = -(-resolution // 250)
+        x_show, y_show, z_show = x_vals[::step], y_vals[::step], emv_grid[::step, ::step]
+        fig = go.Figure()
+        fig.add_trace(go.Heatmap(x=x_show, y=y_show, z=z_show, colorscale='RdYlGn', zmid=0,
+                                 colorbar=dict(title='EMV ($)')))
+        fig.add_trace(go.Contour(x=x_show, y=y_show, z=z_show, showscale=False,
+                                 contours=dict(start=0, end=0, size=1, coloring='lines'),
+                                 line=dict(color='black', width=2), name='Break-even'))
+        fig.add_trace(go.Scatter(x=[emv_inputs[x_input]], y=[emv_inputs[y_input]], mode='markers',
+                                 marker=dict(size=12, color='blue', symbol='x'), name='Current Estimate'))
+        fig.update_layout(title=f'EMV over {input_labels[x_input]} × {input_labels[y_input]} ({resolution}×{resolution} grid)',
+                         xaxis_title=input_labels[x_input], yaxis_title=input_labels[y_input],
+                         showlegend=False, height=500)
+        st.plotly_chart(fig, use_container_width=True)
+        if x_input in PROB_KEYS or y_input in PROB_KEYS:
+            st.caption("The remaining scenario probability absorbs each change; blank cells are infeasible (probabilities above 100%).")
+
+        st.markdown("#### Tornado Chart")
+        if prob_success + prob_moderate > 1 + 1e-9:
+            st.warning("P(High Success) and P(Moderate) add up to more than 100%, so there is no feasible scenario mix to swing. Lower one of them to see the tornado chart.")
+        else:
+            tornado = emv_tornado(emv_inputs)
+            base_emv = float(launch_emv(**emv_inputs))
+            labels = [input_labels[n] for n in tornado['Input']]
+            fig = go.Figure()
+            fig.add_trace(go.Bar(y=labels, x=tornado['EMV Low'] - base_emv, base=base_emv, orientation='h',
+                                 name='Input Low (-20% / -0.1)', marker_color='#ef4444'))
+            fig.add_trace(go.Bar(y=labels, x=tornado['EMV High'] - base_emv, base=base_emv, orientation='h',
+                                 name='Input High (+20% / +0.1)', marker_color='#10b981'))
+            fig.update_layout(title='EMV Swing by Input', barmode='overlay', xaxis_title='Expected Profit ($)',
+                             yaxis=dict(autorange='reversed'), height=400)
+            st.plotly_chart(fig, use_container_width=True)
+            prob_rows = tornado[tornado['Input'].isin(PROB_KEYS)]
+            if ((prob_rows['High Value'] - prob_rows['Low Value']) < 0.2 - 1e-9).any():
+                st.caption("Some probability swings are shorter than ±0.1: a probability stops at 0%, and can only rise as far as the scenario absorbing the change can fall.")
+
+            st.markdown(f'<div class="insight">The EMV is most sensitive to {labels[0]}: moving it across its range swings expected profit by ${tornado["Swing"].iloc[0]:,.0f}. Focus research effort on the inputs at the top of the tornado.</div>', unsafe_allow_html=True)
+
+        # Staged exploration decision tree
+        st.markdown("### Staged Exploration Decision Tree")
+        st.markdown("ExxonMobil-style staged investment: pay for another seismic test, drill now, or walk away. Each test result updates the probability of a commercial find.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_stages = st.slider("Maximum Test Stages", 1, 12, 3, 1)
+            test_cost = st.number_input("Cost per Test ($M)", 0.5, 50.0, 2.0, 0.5)
+        with col2:
+            prior_commercial = st.slider("Prior P(Commercial Find)", 0.05, 0.95, 0.3, 0.05)
+            test_accuracy = st.slider("Test Accuracy", 0.5, 0.99, 0.8, 0.01)
+        with col3:
+            find_value = st.number_input("Value of Commercial Find ($M)", 10.0, 5000.0, 100.0, 10.0)
+            drill_cost = st.number_input("Drilling Cost ($M)", 1.0, 1000.0, 30.0, 1.0)
+
+        start_time = time.perf_counter()
+        exploration_tree = build_exploration_tree(n_stages, test_cost, prior_commercial, test_accuracy,
+                                                  find_value, drill_cost)
+        exploration = exploration_tree.rollback()
+        rollback_ms = (time.perf_counter() - start_time) * 1000
+        first_action = exploration_tree.label[exploration.best_child[0]]
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Tree Size", f"{len(exploration_tree):,} nodes")
+        col2.metric("Optimal First Action", first_action)
+        col3.metric("Expected Value", f"${exploration.values[0]:,.1f}M")
+        col4.metric("Build + Rollback Time", f"{rollback_ms:.1f} ms")
+
+        fig = decision_tree_figure(exploration_tree, exploration,
+                                   f'Exploration Tree ({n_stages} stages, optimal policy in green)',
+                                   show_labels=len(exploration_tree) <= 60)
+        fig.update_layout(height=600)
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f'<div class="insight">Backward induction values every branch from the right: chance nodes take probability-weighted averages, decision nodes keep the best option. The optimal first move is <strong>{first_action}</strong>, worth ${exploration.values[0]:,.1f}M in expectation.</div>', unsafe_allow_html=True)
+
         # Create sample dataset for Startup decisions
         startup_data = pd.DataFrame({
             'Scenario': scenarios,
@@ -1807,14 +2420,8 @@ ExxonMobil uses decision analysis for multi-billion dollar exploration projects:
             if st.checkbox("View Dataset", key="view_ch6_startup"):
                 st.dataframe(startup_data)
         with col2:
-            csv = startup_data.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="startup_decision_data.csv",
-                mime="text/csv",
-                key="download_ch6_startup"
-            )
+            render_dataset_download(startup_data, "download_ch6_startup", "startup_decision_data",
+                                    ("startup", tuple(probabilities), tuple(revenues), total_cost))
 
     with tab3:
         st.markdown("### Flashcards")
@@ -2028,6 +2635,79 @@ elif "7." in chapter:
 
         st.markdown(f'<div class="insight">We are {confidence_level} confident that the true population mean lies between {ci_lower:.1f} and {ci_upper:.1f}.</div>', unsafe_allow_html=True)
 
+        # Bootstrap confidence intervals
+        st.markdown("### Bootstrap Confidence Intervals")
+        st.markdown("No σ and no normality assumption: resample the data itself to see how much the statistic varies.")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            boot_source = st.radio("Sample Source", ["Draw from population above", "Upload CSV"], key="boot_source")
+        with col2:
+            boot_statistic = st.selectbox("Statistic", ["Mean", "Median", "Proportion"], key="boot_statistic")
+        with col3:
+            n_resamples = st.select_slider("Resamples", options=[1_000, 10_000, 100_000], value=10_000,
+                                           format_func=lambda n: f"{n:,}", key="boot_resamples")
+        with col4:
+            boot_conf = st.selectbox("Confidence Level", ["90%", "95%", "99%"], index=1, key="boot_conf")
+
+        boot_sample = None
+        if boot_source == "Upload CSV":
+            uploaded = st.file_uploader("CSV file", type="csv", key="boot_upload")
+            if uploaded is not None:
+                uploaded_df = pd.read_csv(uploaded)
+                numeric_cols = list(uploaded_df.select_dtypes('number').columns)
+                if numeric_cols:
+                    boot_column = st.selectbox("Column", numeric_cols, key="boot_column")
+                    boot_sample = uploaded_df[boot_column].to_numpy(dtype=float)
+                else:
+                    st.warning("The uploaded file has no numeric columns.")
+        else:
+            boot_n = st.select_slider("Sample Size", options=[100, 1_000, 10_000, 100_000], value=1_000,
+                                      format_func=lambda n: f"{n:,}", key="boot_n")
+            boot_sample = np.random.default_rng(7).choice(population, boot_n)
+
+        if boot_sample is not None:
+            boot_sample = boot_sample[np.isfinite(boot_sample)]
+            if len(boot_sample) < 2:
+                st.warning("The bootstrap needs at least two numeric values; this column has fewer once blanks are dropped.")
+                boot_sample = None
+
+        if boot_sample is not None:
+            statistic_key = boot_statistic.lower()
+            if statistic_key == "proportion":
+                boot_threshold = st.number_input("Proportion of values above", value=float(np.median(boot_sample)),
+                                                 key="boot_threshold")
+                boot_sample = (boot_sample > boot_threshold).astype(float)
+            elif statistic_key == "mean" and n_resamples * len(boot_sample) > BOOTSTRAP_MAX_DRAWS:
+                fast_resamples = max(100, BOOTSTRAP_MAX_DRAWS // len(boot_sample))
+                st.info(f"{n_resamples:,} mean resamples of n={len(boot_sample):,} need "
+                        f"{n_resamples * len(boot_sample):,} draws, about "
+                        f"{n_resamples * len(boot_sample) / BOOTSTRAP_MAX_DRAWS * 4:.0f} s per CPU core. "
+                        f"Up to {fast_resamples:,} resamples run in a few seconds.")
+                if not st.checkbox(f"Run all {n_resamples:,} resamples", key="boot_full_run"):
+                    n_resamples = fast_resamples
+
+            boot = cached_bootstrap(boot_sample, statistic_key, n_resamples, int(boot_conf[:-1]) / 100)
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric(f"Sample {boot_statistic}", f"{boot.estimate:.3f}")
+            col2.metric("Bootstrap SE", f"{boot.std_error:.3f}")
+            col3.metric(f"{boot_conf} Percentile CI", f"[{boot.percentile_ci[0]:.3f}, {boot.percentile_ci[1]:.3f}]")
+            col4.metric(f"{boot_conf} BCa CI", f"[{boot.bca_ci[0]:.3f}, {boot.bca_ci[1]:.3f}]")
+
+            counts, edges = np.histogram(boot.replicates, bins=60)
+            fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                        title=f'Bootstrap Distribution of the {boot_statistic} ({n_resamples:,} resamples, n={len(boot_sample):,})',
+                        labels={'x': boot_statistic, 'y': 'Resamples'})
+            for bound in boot.percentile_ci:
+                fig.add_vline(x=bound, line_dash="dash", line_color="red")
+            for bound in boot.bca_ci:
+                fig.add_vline(x=bound, line_dash="dot", line_color="green")
+            fig.add_vline(x=boot.estimate, line_color="black", annotation_text="Estimate")
+            st.plotly_chart(fig, use_container_width=True)
+
+            st.markdown(f'<div class="insight">Red dashed lines: percentile interval. Green dotted lines: BCa interval, which corrects for bias and skewness in the bootstrap distribution. For skewed data the two can differ noticeably.</div>', unsafe_allow_html=True)
+
     with tab2:
         st.markdown('<div class="example-box"><h3>Election Polling Analysis</h3><p>Using sampling and confidence intervals to predict election outcomes</p></div>', unsafe_allow_html=True)
 
@@ -2110,6 +2790,48 @@ Nielsen uses advanced sampling techniques to measure TV viewership:
         else:
             st.markdown(f'<div class="insight">This particular poll missed the true value ({true_support}%). This happens {100-int(conf_level[:-1])}% of the time with {conf_level} confidence intervals. The estimated range is [{ci_lower:.1f}%, {ci_upper:.1f}%].</div>', unsafe_allow_html=True)
 
+        # Coverage simulation
+        st.markdown("### Confidence Interval Coverage at Scale")
+        st.markdown("Run the same poll many times and count how often the interval actually captures the true support.")
+
+        n_polls = st.select_slider("Number of Simulated Polls", options=[10_000, 100_000, 500_000, 1_000_000],
+                                   value=100_000, format_func=lambda n: f"{n:,}")
+        coverage_levels = (0.90, 0.95, 0.99)
+        coverage = poll_coverage(true_support / 100, poll_size, n_polls, coverage_levels)
+
+        cols = st.columns(3)
+        for col, level in zip(cols, coverage_levels):
+            col.metric(f"{level:.0%} CI Coverage", f"{coverage.coverage[level]:.2%}",
+                       delta=f"{(coverage.coverage[level] - level) * 100:+.2f} pts vs nominal", delta_color="off")
+
+        level_idx = coverage_levels.index(int(conf_level[:-1]) / 100)
+        col1, col2 = st.columns(2)
+        with col1:
+            # First 100 polls as one batched error-bar trace
+            shown = 100
+            hit = coverage.covered[level_idx, :shown]
+            fig = go.Figure()
+            for mask, color, name in [(hit, 'blue', 'Captured'), (~hit, 'red', 'Missed')]:
+                fig.add_trace(go.Scatter(
+                    x=np.flatnonzero(mask) + 1, y=coverage.estimates[:shown][mask] * 100, mode='markers',
+                    marker=dict(color=color, size=5), name=name,
+                    error_y=dict(type='data', array=coverage.margins[level_idx, :shown][mask] * 100,
+                                 color=color, thickness=1)
+                ))
+            fig.add_hline(y=true_support, line_dash="dash", annotation_text="True Support")
+            fig.update_layout(title=f'First {shown} Polls with {conf_level} Intervals',
+                            xaxis_title='Poll', yaxis_title='Support (%)')
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            counts, edges = np.histogram(coverage.margins[level_idx] * 100, bins=50)
+            fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                        title=f'Margin of Error across {n_polls:,} Polls',
+                        labels={'x': f'{conf_level} Margin of Error (%)', 'y': 'Polls'})
+            st.plotly_chart(fig, use_container_width=True)
+
+        missed = 1 - coverage.coverage[int(conf_level[:-1]) / 100]
+        st.markdown(f'<div class="insight">Out of {n_polls:,} simulated polls, {missed:.2%} of the {conf_level} intervals missed the true support of {true_support}%, close to the nominal {100 - int(conf_level[:-1])}%. A single poll cannot tell you whether it is one of the misses.</div>', unsafe_allow_html=True)
+
         # Sample size calculator
         st.markdown("### Required Sample Size Calculator")
 
@@ -2146,20 +2868,15 @@ Nielsen uses advanced sampling techniques to measure TV viewership:
         })
 
         # Dataset View/Download
+        dataset_id = ("election", true_support, poll_size, conf_level)
         st.markdown("### Dataset")
         col1, col2 = st.columns([1, 1])
         with col1:
-            if st.checkbox("View Dataset", key="view_ch7_election"):
-                st.dataframe(election_data.head(10))
+            view_dataset = st.checkbox("View Dataset", key="view_ch7_election")
         with col2:
-            csv = election_data.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="election_poll_data.csv",
-                mime="text/csv",
-                key="download_ch7_election"
-            )
+            render_dataset_download(election_data, "download_ch7_election", "election_poll_data", dataset_id)
+        if view_dataset:
+            render_dataset_viewer(election_data, "view_ch7_election", dataset_id)
 
     with tab3:
         st.markdown("### Flashcards")
@@ -2367,6 +3084,30 @@ elif "8." in chapter:
         col1.metric("Cohen's d (Effect Size)", f"{cohens_d:.3f}")
         col2.metric("Effect Size Interpretation", effect_label)
 
+        # Distribution-free check of the same comparison
+        st.markdown("#### Permutation Test")
+        st.markdown("Shuffle the group labels many times to see how large a mean difference arises by chance alone. No normality assumption is needed.")
+
+        n_permutations = st.select_slider("Number of Permutations", options=[1_000, 5_000, 10_000, 50_000],
+                                          value=10_000, format_func=lambda v: f"{v:,}", key="perm_count")
+        perm = cached_permutation_test(sample_a, sample_b, n_permutations)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Observed Difference (A - B)", f"{perm.observed:.3f}")
+        col2.metric("t-test p-value", f"{p_value:.4f}")
+        col3.metric("Permutation p-value", f"{perm.p_value:.4f}")
+
+        counts, edges = np.histogram(perm.null_diffs, bins=80)
+        fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, title='Permutation Distribution of the Mean Difference',
+                     labels={'x': 'Mean Difference (A - B)', 'y': 'Permutations'})
+        fig.update_traces(marker_color='gray')
+        fig.update_layout(bargap=0)
+        fig.add_vline(x=perm.observed, line_color="red", annotation_text="Observed")
+        fig.add_vline(x=-perm.observed, line_color="red", line_dash="dash")
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f'<div class="insight">{perm.p_value:.2%} of {n_permutations:,} random relabellings produced a difference at least as extreme as the observed {perm.observed:.3f}. The t-test gives p = {p_value:.4f}; when the two agree, the t-test\'s assumptions are not driving the conclusion.</div>', unsafe_allow_html=True)
+
     with tab2:
         st.markdown('<div class="example-box"><h3>Website A/B Testing</h3><p>Testing whether a new website design improves conversion rate</p></div>', unsafe_allow_html=True)
 
@@ -2478,6 +3219,45 @@ The BNT162b2 mRNA vaccine trial demonstrated:
         col2.metric("Relative Lift", f"{lift:+.1f}%")
         col3.metric("95% CI for Difference", f"[{ci_lower:.2f}%, {ci_upper:.2f}%]")
 
+        # Bayesian analysis of the same test
+        st.markdown("### Bayesian Analysis")
+        st.markdown("With a uniform Beta(1, 1) prior, each conversion rate has a Beta posterior. Instead of a p-value, we get the probability that B is better and the expected cost of choosing wrong.")
+
+        bayes = bayesian_ab(visitors_a, conversions_a, visitors_b, conversions_b)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("P(B > A)", f"{bayes.prob_b_better:.1%}")
+        col2.metric("Expected Loss (Choose A)", f"{bayes.expected_loss_a * 100:.3f}%")
+        col3.metric("Expected Loss (Choose B)", f"{bayes.expected_loss_b * 100:.3f}%")
+        col4.metric("95% Credible Interval (Lift)", f"[{bayes.lift_ci[0]:+.1%}, {bayes.lift_ci[1]:+.1%}]")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            (alpha_a, beta_a), (alpha_b, beta_b) = bayes.posterior_a, bayes.posterior_b
+            lo = min(stats.beta.ppf(0.0005, alpha_a, beta_a), stats.beta.ppf(0.0005, alpha_b, beta_b))
+            hi = max(stats.beta.ppf(0.9995, alpha_a, beta_a), stats.beta.ppf(0.9995, alpha_b, beta_b))
+            rate_grid = np.linspace(lo, hi, 400)
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=rate_grid * 100, y=stats.beta.pdf(rate_grid, alpha_a, beta_a), mode='lines',
+                                     name='Version A', fill='tozeroy', line=dict(color='blue')))
+            fig.add_trace(go.Scatter(x=rate_grid * 100, y=stats.beta.pdf(rate_grid, alpha_b, beta_b), mode='lines',
+                                     name='Version B', fill='tozeroy', line=dict(color='red')))
+            fig.update_layout(title='Posterior Conversion Rates', xaxis_title='Conversion Rate (%)', yaxis_title='Density')
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            counts, edges = np.histogram(bayes.lift_draws * 100, bins=100)
+            fig = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, title='Posterior Relative Lift of B over A',
+                         labels={'x': 'Relative Lift (%)', 'y': 'Draws'})
+            fig.update_traces(marker_color='purple')
+            fig.update_layout(bargap=0)
+            fig.add_vline(x=0, line_dash="dash", line_color="black")
+            for bound in bayes.lift_ci:
+                fig.add_vline(x=bound * 100, line_dash="dot", line_color="green")
+            st.plotly_chart(fig, use_container_width=True)
+
+        bayes_choice = "B" if bayes.expected_loss_b < bayes.expected_loss_a else "A"
+        st.markdown(f'<div class="insight">There is a {bayes.prob_b_better:.1%} probability that Version B converts better than Version A. Shipping Version {bayes_choice} carries the smaller expected loss ({min(bayes.expected_loss_a, bayes.expected_loss_b) * 100:.3f} percentage points of conversion), and the relative lift lies between {bayes.lift_ci[0]:+.1%} and {bayes.lift_ci[1]:+.1%} with 95% probability.</div>', unsafe_allow_html=True)
+
         # Revenue impact (example)
         avg_order_value = st.number_input("Average Order Value ($)", 10, 1000, 100, 10)
 
@@ -2494,6 +3274,233 @@ The BNT162b2 mRNA vaccine trial demonstrated:
 
         st.markdown(f'<div class="insight">If implemented, Version B could generate an additional ${annual_impact:,.0f} annually based on {annual_visitors:,} visitors and ${avg_order_value} average order value.</div>', unsafe_allow_html=True)
 
+        # Power analysis and sample size planning
+        st.markdown("### Test Planning: Power & Sample Size")
+        st.markdown("Before running a test, decide how many visitors you need to reliably detect the effect you care about.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            plan_test = st.radio("Test Type", ["Two-proportion z-test", "Two-sample t-test"], key="plan_test")
+        with col2:
+            if plan_test == "Two-proportion z-test":
+                target_effect = st.slider("Target Relative Lift (%)", 1, 100, 20, 1, key="plan_lift") / 100
+            else:
+                target_effect = st.slider("Target Effect Size (Cohen's d)", 0.05, 1.5, 0.2, 0.05, key="plan_d")
+        with col3:
+            target_power = st.select_slider("Desired Power", options=[0.8, 0.9, 0.95], value=0.8, key="plan_power")
+
+        baseline = conv_rate_a / 100
+        current_n = min(visitors_a, visitors_b)
+        if plan_test == "Two-proportion z-test":
+            needed_n = int(required_n_two_proportions(baseline, target_effect, sig_level, target_power))
+            current_power = float(power_two_proportions(baseline, target_effect, current_n, sig_level))
+            effect_label = "Relative Lift"
+            grid = power_grid("proportion", baseline, sig_level, 1.0, 1_000_000)
+            grid_effects = grid.effects * 100
+        else:
+            needed_n = required_n_two_sample_t(target_effect, sig_level, target_power)
+            current_power = float(power_two_sample_t(target_effect, current_n, sig_level))
+            effect_label = "Cohen's d"
+            grid = power_grid("t", None, sig_level, 1.5, 100_000)
+            grid_effects = grid.effects
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Required per Arm", f"{needed_n:,}")
+        col2.metric("Total Required", f"{2 * needed_n:,}")
+        col3.metric("Power of Current Test", f"{current_power:.1%}", delta=f"n = {current_n:,} per arm", delta_color="off")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = go.Figure()
+            for scale in [0.5, 1.0, 1.5, 2.0]:
+                effect = target_effect * scale
+                if plan_test == "Two-proportion z-test":
+                    curve = power_two_proportions(baseline, effect, grid.sample_sizes, sig_level)
+                    name = f"Lift {effect:.0%}"
+                else:
+                    curve = power_two_sample_t(effect, grid.sample_sizes, sig_level)
+                    name = f"d = {effect:.2f}"
+                fig.add_trace(go.Scatter(x=grid.sample_sizes, y=curve, mode='lines', name=name))
+            fig.add_hline(y=target_power, line_dash="dash", line_color="red", annotation_text="Target Power")
+            fig.add_vline(x=needed_n, line_dash="dot", line_color="green", annotation_text="Required n")
+            fig.update_layout(title='Power Curves', xaxis_title='Visitors per Arm', yaxis_title='Power',
+                            xaxis_type='log', yaxis_range=[0, 1.02])
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = go.Figure(go.Heatmap(x=grid.sample_sizes, y=grid_effects, z=grid.power, colorscale='Viridis',
+                                       zmin=0, zmax=1, colorbar=dict(title='Power')))
+            fig.add_trace(go.Contour(x=grid.sample_sizes, y=grid_effects, z=grid.power, showscale=False,
+                                     contours=dict(start=target_power, end=target_power, size=1, coloring='lines'),
+                                     line=dict(color='white', width=2)))
+            fig.update_layout(title=f'Power by {effect_label} and Sample Size (α = {sig_level})',
+                            xaxis_title='Visitors per Arm', yaxis_title=effect_label, xaxis_type='log')
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown(f'<div class="insight">To detect a {effect_label.lower()} of {target_effect:.0%} with {target_power:.0%} power at α = {sig_level}, you need {needed_n:,} visitors per arm. The current test has {current_power:.0%} power for that effect.</div>'
+                    if plan_test == "Two-proportion z-test" else
+                    f'<div class="insight">To detect an effect size of d = {target_effect:.2f} with {target_power:.0%} power at α = {sig_level}, you need {needed_n:,} observations per group. The current test size gives {current_power:.0%} power.</div>',
+                    unsafe_allow_html=True)
+
+        # Sequential testing on a simulated visitor stream
+        st.markdown("### Sequential Testing")
+        st.markdown("Instead of one analysis at the end, check the test at planned interim looks. Group-sequential boundaries keep the overall false-positive rate at α even though you peek several times.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            seq_visitors = st.select_slider("Total Visitors in Stream", options=[100_000, 250_000, 500_000, 1_000_000, 2_000_000, 5_000_000],
+                                            value=1_000_000, format_func=lambda v: f"{v:,}", key="seq_visitors")
+        with col2:
+            seq_looks = st.slider("Number of Looks", 2, 20, 5, key="seq_looks")
+        with col3:
+            seq_design = st.selectbox("Boundary Design", SEQUENTIAL_DESIGNS, key="seq_design")
+
+        seq = run_sequential_test(conv_rate_a / 100, conv_rate_b / 100, seq_visitors, seq_looks, sig_level, seq_design)
+        stop_look = seq.stop_look
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Decision", seq.decision)
+        col2.metric("Stopped at Look", f"{stop_look + 1} of {seq_looks}" if stop_look is not None else "—")
+        col3.metric("Visitors Used", f"{seq.looks[stop_look] if stop_look is not None else seq.looks[-1]:,}")
+        col4.metric("Final Boundary |z|", f"{seq.bounds[-1]:.3f}", delta=f"fixed test: {stats.norm.ppf(1 - sig_level / 2):.3f}", delta_color="off")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=seq.looks, y=seq.bounds, mode='lines+markers', name='Upper Boundary',
+                                     line=dict(color='red', dash='dash')))
+            fig.add_trace(go.Scatter(x=seq.looks, y=-seq.bounds, mode='lines+markers', name='Lower Boundary',
+                                     line=dict(color='red', dash='dash')))
+            fig.add_trace(go.Scatter(x=seq.looks, y=seq.z, mode='lines+markers', name='z-statistic',
+                                     line=dict(color='blue')))
+            if stop_look is not None:
+                fig.add_vline(x=seq.looks[stop_look], line_dash="dot", line_color="green", annotation_text="Stop")
+            fig.update_layout(title=f'{seq_design} Boundaries', xaxis_title='Visitors', yaxis_title='z')
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=seq.looks, y=seq.p_value, mode='lines+markers', name='Nominal p-value'))
+            fig.add_trace(go.Scatter(x=seq.looks, y=seq.always_valid_p, mode='lines+markers', name='Always-valid p-value'))
+            fig.add_hline(y=sig_level, line_dash="dash", line_color="red", annotation_text=f"α = {sig_level}")
+            fig.update_layout(title='p-value Trajectory', xaxis_title='Visitors', yaxis_title='p-value', yaxis_type='log')
+            st.plotly_chart(fig, use_container_width=True)
+
+        if stop_look is not None:
+            st.markdown(f'<div class="insight">The z-statistic crossed the {seq_design} boundary at look {stop_look + 1}, after {seq.looks[stop_look]:,} visitors ({seq.looks[stop_look] / seq_visitors:.0%} of the planned stream). Decision: {seq.decision}. The always-valid p-value can be checked after every visitor without inflating false positives.</div>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<div class="insight">The z-statistic never crossed the {seq_design} boundary across {seq_looks} looks, so the test runs to completion without rejecting H₀. Final nominal p-value: {seq.p_value[-1]:.4f}.</div>', unsafe_allow_html=True)
+
+        # A/B/n testing with many challengers
+        st.markdown("### A/B/n Testing: Many Variants")
+        st.markdown("Testing many variants at once multiplies the chances of a false winner. Each variant is compared to the control, then the p-values are corrected across the whole family.")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            n_variants = st.select_slider("Number of Variants", options=[2, 5, 10, 50, 100, 500, 1000, 2000], value=100, key="abn_variants")
+        with col2:
+            abn_visitors = st.select_slider("Visitors per Variant", options=[1_000, 5_000, 10_000, 50_000, 100_000],
+                                            value=10_000, format_func=lambda v: f"{v:,}", key="abn_visitors")
+        with col3:
+            winner_share = st.slider("Truly Better Variants (%)", 0, 50, 5, key="abn_share") / 100
+        with col4:
+            winner_lift = st.slider("True Lift of Winners (%)", 1, 50, 10, key="abn_lift") / 100
+
+        abn_visits, abn_conversions, abn_truth = simulate_variants(n_variants, abn_visitors, conv_rate_a / 100,
+                                                                   winner_share, winner_lift)
+        abn_table = abn_test(abn_visits, abn_conversions, sig_level)
+        # abn_test names variant i "Variant i", so the number indexes the simulated truth
+        truly_better = abn_truth[abn_table['Variant'].str.rsplit(' ', n=1).str[-1].astype(int).to_numpy()]
+        improved = abn_table['Lift_vs_Control'].to_numpy() > 0
+
+        col1, col2, col3 = st.columns(3)
+        for col, label, flag in [(col1, "Uncorrected", 'Significant_Raw'), (col2, "Holm (FWER)", 'Significant_Holm'),
+                                 (col3, "Benjamini-Hochberg (FDR)", 'Significant_BH')]:
+            declared = abn_table[flag].to_numpy() & improved
+            false_wins = int((declared & ~truly_better).sum())
+            col.metric(f"Winners: {label}", f"{int(declared.sum()):,}", delta=f"{false_wins:,} false", delta_color="inverse")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            sorted_p = np.sort(abn_table['P_Value'].to_numpy())
+            rank = np.arange(1, len(sorted_p) + 1)
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=rank, y=sorted_p, mode='markers', name='Sorted p-values', marker=dict(size=4)))
+            fig.add_trace(go.Scatter(x=rank, y=rank / len(sorted_p) * sig_level, mode='lines', name='BH line (i/m·α)',
+                                     line=dict(color='green')))
+            fig.add_trace(go.Scatter(x=rank, y=sig_level / (len(sorted_p) - rank + 1), mode='lines', name='Holm line',
+                                     line=dict(color='orange')))
+            fig.add_hline(y=sig_level, line_dash="dash", line_color="red", annotation_text=f"α = {sig_level}")
+            fig.update_layout(title='p-values vs Correction Thresholds', xaxis_title='Rank', yaxis_title='p-value',
+                            xaxis_type='log', yaxis_type='log')
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            top = abn_table.head(20)
+            fig = px.bar(top, x='Lift_vs_Control', y='Variant', orientation='h', color='Significant_BH',
+                         title='Top 20 Variants by Conversion Rate',
+                         labels={'Lift_vs_Control': 'Lift vs Control', 'Significant_BH': 'BH Significant'},
+                         color_discrete_map={True: 'green', False: 'gray'})
+            fig.update_layout(yaxis=dict(autorange='reversed'), xaxis_tickformat='.0%')
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(abn_table.head(50).style.format({'Conversion_Rate': '{:.2%}', 'Lift_vs_Control': '{:+.1%}', 'Z': '{:.2f}',
+                                                      'P_Value': '{:.4f}', 'Holm_P': '{:.4f}', 'BH_Q': '{:.4f}'}),
+                     use_container_width=True)
+
+        raw_false = int((abn_table['Significant_Raw'].to_numpy() & improved & ~truly_better).sum())
+        st.markdown(f'<div class="insight">With {n_variants:,} variants, uncorrected tests at α = {sig_level} declare {raw_false:,} false winners. Holm controls the chance of any false winner; Benjamini-Hochberg keeps the expected share of false winners among discoveries at {sig_level:.0%} while finding more of the {int(abn_truth.sum()):,} truly better variants.</div>', unsafe_allow_html=True)
+
+        # Live simulated visitor stream
+        st.markdown("### Live Visitor Stream")
+        st.markdown("Simulate traffic arriving in batches at the true conversion rates above. Counts, z-statistic, p-value and confidence interval update after every batch, so you can watch the conclusion form.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            stream_visitors = st.select_slider("Visitors to Stream", options=[100_000, 1_000_000, 5_000_000, 10_000_000],
+                                               value=1_000_000, format_func=lambda v: f"{v:,}", key="stream_visitors")
+        with col2:
+            stream_batch = st.select_slider("Batch Size", options=[1_000, 10_000, 100_000],
+                                            value=10_000, format_func=lambda v: f"{v:,}", key="stream_batch")
+
+        stream_args = (conv_rate_a / 100, conv_rate_b / 100, stream_visitors, stream_batch, 1 - sig_level)
+        stream = run_stream_ab_test(*stream_args)
+        live_frame = st.empty()
+
+        if st.button("▶ Stream Live", key="stream_run"):
+            snapshots = []
+            n_batches = -(-stream_visitors // stream_batch)
+            every = max(1, n_batches // 40)
+            for snapshot in stream_ab_test(*stream_args):
+                snapshots.append(snapshot)
+                if len(snapshots) % every == 0 or len(snapshots) == n_batches:
+                    render_stream_frame(live_frame, StreamSnapshot(*map(np.array, zip(*snapshots))), sig_level)
+        else:
+            render_stream_frame(live_frame, stream, sig_level)
+
+        first_significant = np.flatnonzero(stream.p_value < sig_level)
+        crossings = int(np.count_nonzero(np.diff((stream.p_value < sig_level).astype(np.int8))))
+        st.caption(f"Pipeline throughput: {stream.visitors_per_second:,.0f} simulated visitors per second "
+                   f"({len(stream.visitors):,} batches).")
+
+        st.markdown("#### The Cost of Peeking")
+        peeks = st.slider("Number of Peeks", 1, 100, 20, key="stream_peeks")
+        peeking = peeking_error_rates(conv_rate_a / 100, stream_visitors, peeks, sig_level)
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=np.arange(1, peeks + 1), y=peeking.ever_significant * 100, mode='lines+markers',
+                                 name='Stop at first significant peek'))
+        fig.add_trace(go.Scatter(x=np.arange(1, peeks + 1), y=peeking.significant_at_peek * 100, mode='lines+markers',
+                                 name='Single test at that point'))
+        fig.add_hline(y=sig_level * 100, line_dash="dash", line_color="red", annotation_text=f"Nominal α = {sig_level:.0%}")
+        fig.update_layout(title='False Positive Rate in A/A Tests (No True Difference)', xaxis_title='Peeks So Far',
+                        yaxis_title='False Positive Rate (%)')
+        st.plotly_chart(fig, use_container_width=True)
+
+        if first_significant.size:
+            stream_note = (f"In this stream the p-value first dipped below α after {stream.visitors[first_significant[0]]:,} visitors "
+                           f"and crossed the threshold {crossings} times in total.")
+        else:
+            stream_note = "In this stream the p-value never dipped below α."
+        st.markdown(f'<div class="insight">{stream_note} If you stop the first time any of {peeks} peeks looks significant, the false positive rate rises from {sig_level:.0%} to {peeking.ever_significant[-1]:.1%}. Fix the sample size in advance or use the sequential boundaries above.</div>', unsafe_allow_html=True)
+
         # Create sample dataset for A/B testing
         ab_test_data = pd.DataFrame({
             'Version': ['A (Control)', 'B (Treatment)'],
@@ -2514,14 +3521,9 @@ The BNT162b2 mRNA vaccine trial demonstrated:
             if st.checkbox("View Dataset", key="view_ch8_abtest"):
                 st.dataframe(ab_test_data)
         with col2:
-            csv = ab_test_data.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name="ab_test_data.csv",
-                mime="text/csv",
-                key="download_ch8_abtest"
-            )
+            render_dataset_download(ab_test_data, "download_ch8_abtest", "ab_test_data",
+                                    ("ab_test", visitors_a, conversions_a, visitors_b, conversions_b,
+                                     avg_order_value, sig_level))
 
     with tab3:
         st.markdown("### Flashcards")
@@ -0,0 +1,363 @@
+"""Probability engines for the insurance-risk example (Chapter 4)."""
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from array_tools import readonly
+from decision_analysis import CHANCE, DecisionTree
+
+AGE_GROUPS = ("16-25", "26-40", "41-60", "60+")
+AGE_BASE_RISK = np.array([0.15, 0.08, 0.06, 0.10])
+BASE_PREMIUM = 1200
+REFERENCE_RISK = 0.08  # risk that pays exactly the base premium
+MAX_RISK = 0.95
+SCORING_CHUNK_ROWS = 65_536  # float32 scratch buffers stay in cache
+
+
+RiskScores = namedtuple(
+    "RiskScores", ["base_risk", "behavior_factor", "score_factor", "accident_risk", "annual_premium"]
+)
+
+
+def encode_age_groups(labels):
+    """Map age-group labels to int8 codes indexing AGE_GROUPS."""
+    codes = pd.Categorical(labels, categories=AGE_GROUPS).codes
+    if (codes < 0).any():
+        raise ValueError(f"Unknown age group; expected one of {AGE_GROUPS}")
+    return codes.astype(np.int8)
+
+
+def score_drivers(age_codes, driving_score, speeding, hard_braking):
+    """Accident risk and premium for arrays of drivers (broadcasts).
+
+    Base risk comes from the age group, scaled by a behaviour factor
+    (speeding and hard-braking events per month) and by the driving score,
+    and is capped at MAX_RISK. Every intermediate factor is returned so the
+    dataset can show its working.
+    """
+    base_risk = AGE_BASE_RISK[np.asarray(age_codes)]
+    behavior_factor = 1 + np.asarray(speeding) * 0.02 + np.asarray(hard_braking) * 0.01
+    score_factor = (100 - np.asarray(driving_score)) / 100
+    accident_risk = np.minimum(base_risk * behavior_factor * (1 + score_factor), MAX_RISK)
+    annual_premium = BASE_PREMIUM * accident_risk / REFERENCE_RISK
+    return RiskScores(base_risk, behavior_factor, score_factor, accident_risk, annual_premium)
+
+
+def price_drivers(age_codes, driving_score, speeding, hard_braking, chunk_rows=SCORING_CHUNK_ROWS):
+    """Batch API: annual premiums only, for fleets of millions of drivers.
+
+    Works through cache-sized chunks in float32 with in-place arithmetic,
+    so peak scratch memory is a few chunk-length buffers whatever the fleet
+    size. Inputs can be compact integer arrays (int8 codes, uint8 counts).
+    """
+    n = len(age_codes)
+    premiums = np.empty(n, dtype=np.float32)
+    base_premiums = (AGE_BASE_RISK * BASE_PREMIUM / REFERENCE_RISK).astype(np.float32)
+    cap = np.float32(BASE_PREMIUM * MAX_RISK / REFERENCE_RISK)
+    factor = np.empty(min(chunk_rows, n), dtype=np.float32)
+    scratch = np.empty_like(factor)
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        rows = stop - start
+        f, tmp, out = factor[:rows], scratch[:rows], premiums[start:stop]
+        # behaviour factor: 1 + 0.02 * speeding + 0.01 * hard braking
+        np.multiply(speeding[start:stop], np.float32(0.02), out=f)
+        np.multiply(hard_braking[start:stop], np.float32(0.01), out=tmp)
+        f += tmp
+        f += 1
+        # score multiplier: 1 + (100 - score) / 100 = 2 - score / 100
+        np.multiply(driving_score[start:stop], np.float32(-0.01), out=tmp)
+        tmp += 2
+        f *= tmp
+        np.take(base_premiums, age_codes[start:stop], out=out)
+        out *= f
+        np.minimum(out, cap, out=out)
+    return premiums
+
+
+def synthetic_fleet(n_drivers, seed=42):
+    """Compact random fleet: int8 age codes and uint8 score and event counts."""
+    rng = np.random.default_rng(seed)
+    return (rng.integers(0, len(AGE_GROUPS), n_drivers, dtype=np.int8),
+            rng.integers(50, 100, n_drivers, dtype=np.uint8),
+            rng.integers(0, 20, n_drivers, dtype=np.uint8),
+            rng.integers(0, 30, n_drivers, dtype=np.uint8))
+
+
+def benchmark_pricing(n_drivers=10_000_000, seed=42):
+    """Time `price_drivers` on a synthetic fleet; returns (seconds, drivers/s)."""
+    fleet = synthetic_fleet(n_drivers, seed)
+    start = time.perf_counter()
+    price_drivers(*fleet)
+    elapsed = time.perf_counter() - start
+    return elapsed, n_drivers / elapsed
+
+
+EVENT_TYPES = ("speeding", "hard_braking")
+FLEET_MEAN_RATES = np.array([9.5, 14.5])  # events per month, fleet averages in the example dataset
+FLEET_RATE_SHAPE = 4.0  # Gamma shape of event rates across drivers (coefficient of variation 0.5)
+
+
+class DriverPosteriors:
+    """Conjugate risk posteriors for a fleet, held in compact per-driver arrays.
+
+    Each event type has a Gamma posterior on the driver's monthly Poisson
+    rate, starting from the fleet-wide Gamma(prior_shape, prior_shape /
+    mean_rate) distribution of rates. Because the risk formula is linear in
+    the event rates (below the cap), plugging in the posterior mean rates
+    gives the posterior expected behaviour-implied risk. A Beta posterior
+    on the annual accident probability is centred on that risk with
+    `accident_prior_years` of weight and updated with observed accidents
+    per year of exposure.
+
+    All updates are batched array passes (bincounts over chunks of streamed
+    events), so millions of drivers can be updated at once.
+    """
+
+    def __init__(self, age_codes, driving_score, prior_shape=FLEET_RATE_SHAPE, prior_rates=FLEET_MEAN_RATES,
+                 accident_prior_years=10.0):
+        self.age_codes = np.asarray(age_codes, dtype=np.int8)
+        self.driving_score = np.asarray(driving_score, dtype=np.float32)
+        n = len(self.age_codes)
+        self.prior_shape = prior_shape
+        self.prior_months = (prior_shape / np.asarray(prior_rates, dtype=np.float32))[:, None]
+        self.accident_prior_years = accident_prior_years
+        self.shape = np.full((len(EVENT_TYPES), n), prior_shape, dtype=np.float32)
+        self.months = np.zeros(n, dtype=np.float32)
+        self.accidents = np.zeros(n, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.age_codes)
+
+    def observe_events(self, driver_ids, event_codes):
+        """Fold one chunk of streamed events (driver index, EVENT_TYPES code)."""
+        n = len(self)
+        keys = np.asarray(event_codes, dtype=np.intp) * n + driver_ids
+        self.shape += np.bincount(keys, minlength=len(EVENT_TYPES) * n).reshape(len(EVENT_TYPES), n)
+
+    def observe_exposure(self, months, driver_ids=None):
+        """Add months of driving for every driver, or only for `driver_ids`."""
+        if driver_ids is None:
+            self.months += months
+        else:
+            self.months += np.bincount(driver_ids, minlength=len(self)) * np.float32(months)
+
+    def observe_accidents(self, driver_ids):
+        self.accidents += np.bincount(driver_ids, minlength=len(self))
+
+    def event_counts(self):
+        """Observed events per type and driver (posterior shape minus prior)."""
+        return self.shape - self.prior_shape
+
+    def rate_means(self):
+        """Posterior mean monthly rate for each event type, shape (types, drivers)."""
+        return self.shape / (self.prior_months + self.months)
+
+    def rate_intervals(self, level=0.95):
+        """Equal-tailed credible intervals (low, high) on each monthly rate."""
+        tail = (1 - level) / 2
+        scale = 1 / (self.prior_months + self.months)
+        return (stats.gamma.ppf(tail, self.shape, scale=scale),
+                stats.gamma.ppf(1 - tail, self.shape, scale=scale))
+
+    def behavior_risk(self):
+        speeding, hard_braking = self.rate_means()
+        return score_drivers(self.age_codes, self.driving_score, speeding, hard_braking).accident_risk
+
+    def accident_posterior(self):
+        """Beta (alpha, beta) on the annual accident probability."""
+        risk = self.behavior_risk()
+        years = self.months / 12
+        alpha = risk * self.accident_prior_years + self.accidents
+        beta = (1 - risk) * self.accident_prior_years + np.maximum(years - self.accidents, 0)
+        return alpha, beta
+
+    def posterior_risk(self):
+        alpha, beta = self.accident_posterior()
+        return alpha / (alpha + beta)
+
+
+def telematics_stream(true_rates, months, seed=42):
+    """Yield one month of simulated events at a time as (driver_ids, event_codes).
+
+    `true_rates` has shape (len(EVENT_TYPES), drivers). Events within a
+    month are emitted as flat int32/int8 arrays, so memory is bounded by one
+    month of traffic however long the stream runs.
+    """
+    rng = np.random.default_rng(seed)
+    n_types, n = true_rates.shape
+    drivers = np.tile(np.arange(n, dtype=np.int32), n_types)
+    types = np.arange(n_types, dtype=np.int8)
+    for _ in range(months):
+        counts = rng.poisson(true_rates)
+        yield np.repeat(drivers, counts.ravel()), np.repeat(types, counts.sum(axis=1))
+
+
+FleetUpdateResult = namedtuple(
+    "FleetUpdateResult", ["months", "posterior_rmse", "raw_rmse", "prior_risk", "posterior_risk", "true_risk"]
+)
+
+
+@lru_cache(maxsize=8)
+def simulate_fleet_updates(n_drivers, months=12, seed=42):
+    """Stream simulated telematics for a heterogeneous fleet into DriverPosteriors.
+
+    True monthly event rates are drawn from the fleet-wide Gamma
+    distribution. After each month the error of the posterior mean rates and
+    of the raw per-driver averages (events / months) is recorded, showing
+    how the prior shrinks noisy early estimates.
+    """
+    rng = np.random.default_rng(seed)
+    age_codes, driving_score, _, _ = synthetic_fleet(n_drivers, seed)
+    true_rates = rng.gamma(FLEET_RATE_SHAPE, FLEET_MEAN_RATES[:, None] / FLEET_RATE_SHAPE,
+                           (len(EVENT_TYPES), n_drivers))
+    true_risk = score_drivers(age_codes, driving_score, *true_rates).accident_risk
+
+    fleet = DriverPosteriors(age_codes, driving_score)
+    prior_risk = fleet.posterior_risk()
+    posterior_rmse, raw_rmse = np.empty(months), np.empty(months)
+    for month, (driver_ids, event_codes) in enumerate(telematics_stream(true_rates, months, seed + 1)):
+        fleet.observe_events(driver_ids, event_codes)
+        fleet.observe_exposure(1.0)
+        fleet.observe_accidents(np.flatnonzero(rng.random(n_drivers) < true_risk / 12))
+        posterior_rmse[month] = np.sqrt(np.mean((fleet.rate_means() - true_rates) ** 2))
+        raw_rmse[month] = np.sqrt(np.mean((fleet.event_counts() / (month + 1) - true_rates) ** 2))
+
+    return FleetUpdateResult(*readonly(np.arange(1, months + 1), posterior_rmse, raw_rmse,
+                                        prior_risk, fleet.posterior_risk(), true_risk))
+
+
+class ProbabilityTree(DecisionTree):
+    """Tree of conditional probabilities on the DecisionTree flat arrays.
+
+    Every node is a chance event whose `probability` is conditional on its
+    parent. Joint probabilities are products along each path, computed one
+    depth level at a time, so marginals and conditionals over hundreds of
+    leaves are a few array operations. Layout is inherited.
+    """
+
+    def branch(self, label, parent=None, probability=1.0):
+        return self.add(CHANCE, label, parent, probability)
+
+    def is_leaf(self):
+        has_children = np.zeros(len(self), dtype=bool)
+        has_children[[p for p in self.parent if p >= 0]] = True
+        return ~has_children
+
+    def check(self, tolerance=1e-9):
+        """Raise ValueError unless every node's branch probabilities sum to 1."""
+        _, parent, prob, _, _ = self.arrays()
+        children = parent >= 0
+        totals = np.bincount(parent[children], weights=prob[children], minlength=len(self))
+        bad = np.flatnonzero(~self.is_leaf() & (np.abs(totals - 1) > tolerance))
+        if bad.size:
+            raise ValueError(f"Branch probabilities under '{self.label[bad[0]]}' sum to {totals[bad[0]]:.4f}")
+
+    def joint(self):
+        """P(path to node) for every node."""
+        _, parent, prob, _, depth = self.arrays()
+        joint = prob.copy()
+        for d in range(1, depth.max() + 1):
+            nodes = np.flatnonzero(depth == d)
+            joint[nodes] *= joint[parent[nodes]]
+        return joint
+
+    def path_contains(self, label):
+        """Mask of nodes whose path from the root passes through `label`."""
+        _, parent, _, _, depth = self.arrays()
+        on_path = np.array(self.label, dtype=object) == label
+        for d in range(1, depth.max() + 1):
+            nodes = np.flatnonzero(depth == d)
+            on_path[nodes] |= on_path[parent[nodes]]
+        return on_path
+
+    def marginals(self):
+        """Total probability of each distinct leaf label, as a dict."""
+        leaves = np.flatnonzero(self.is_leaf())
+        labels, inverse = np.unique(np.array(self.label, dtype=object)[leaves], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.joint()[leaves])
+        return dict(zip(labels.tolist(), totals.tolist()))
+
+    def conditional(self, event, given):
+        """P(event | given) for two node labels, summed over all leaves."""
+        leaves = self.is_leaf()
+        joint = self.joint()
+        given_mass = joint[leaves & self.path_contains(given)].sum()
+        both = joint[leaves & self.path_contains(given) & self.path_contains(event)].sum()
+        return both / given_mass if given_mass > 0 else np.nan
+
+
+def build_risk_tree(driving_score, speeding, hard_braking, risky_share, score_bands=1):
+    """Age group -> (score band) -> behaviour -> accident probability tree.
+
+    Age groups are equally likely. With `score_bands` > 1 an extra level
+    splits drivers into equal-width driving-score bands between 50 and 100
+    (the fleet's range) instead of using `driving_score`. Risky drivers have
+    the given monthly speeding and hard-braking rates, safe drivers none;
+    accident probabilities come from score_drivers, so every leaf is
+    computed from the same model as the premium. The finished tree is
+    checked so that every set of branch probabilities sums to 1.
+    """
+    tree = ProbabilityTree()
+    root = tree.branch("All Drivers")
+    if score_bands > 1:
+        edges = np.linspace(50, 100, score_bands + 1)
+        bands = [(f"Score {lo:.0f}-{hi:.0f}", (lo + hi) / 2) for lo, hi in zip(edges[:-1], edges[1:])]
+    else:
+        bands = [(None, driving_score)]
+    for code, age in enumerate(AGE_GROUPS):
+        age_node = tree.branch(f"Age {age}", root, 1 / len(AGE_GROUPS))
+        for band_label, score in bands:
+            band_node = age_node if band_label is None else tree.branch(band_label, age_node, 1 / len(bands))
+            for behavior, share, events in (("Risky Behavior", risky_share, (speeding, hard_braking)),
+                                            ("Safe Behavior", 1 - risky_share, (0, 0))):
+                risk = float(score_drivers(code, score, *events).accident_risk)
+                node = tree.branch(behavior, band_node, share)
+                tree.branch("Accident", node, risk)
+                tree.branch("No Accident", node, 1 - risk)
+    tree.check()
+    return tree
+
+
+ConditionalSimulation = namedtuple(
+    "ConditionalSimulation", ["draws", "p_a_given_b", "p_b_given_a", "joint"]
+)
+
+
+@lru_cache(maxsize=16)
+def simulate_conditional(p_a, p_b, p_a_and_b, n_draws=10_000_000, checkpoints=400, seed=42):
+    """Draw correlated (A, B) event pairs from the joint distribution in one pass.
+
+    A single uniform per draw is mapped onto the four cells of the 2x2
+    joint table (A and B, A only, B only, neither), so the dependence
+    between A and B is exact. Running P(A|B) and P(B|A) come from cumulative
+    sums and are reported at `checkpoints` log-spaced sample sizes;
+    `joint` is the empirical 2x2 table [[AB, A not B], [B not A, neither]].
+    """
+    p_neither = 1 - p_a - p_b + p_a_and_b
+    if p_a_and_b > min(p_a, p_b) + 1e-12 or p_neither < -1e-12:
+        raise ValueError("P(A), P(B) and P(A and B) do not form a valid joint distribution")
+
+    rng = np.random.default_rng(seed)
+    u = rng.random(n_draws, dtype=np.float32)
+    # Cells laid out on [0, 1): [AB | A only | B only | neither]
+    a = u < p_a
+    b = (u < p_a_and_b) | ((u >= p_a) & (u < p_a + p_b - p_a_and_b))
+    both = a & b
+
+    draws = np.unique(np.geomspace(1, n_draws, checkpoints).astype(np.int64))
+    idx = draws - 1
+    count_a = np.cumsum(a, dtype=np.int32)[idx]
+    count_b = np.cumsum(b, dtype=np.int32)[idx]
+    count_both = np.cumsum(both, dtype=np.int32)[idx]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_a_given_b = count_both / count_b
+        p_b_given_a = count_both / count_a
+
+    n_both, n_a, n_b = count_both[-1], count_a[-1], count_b[-1]
+    joint = np.array([[n_both, n_a - n_both], [n_b - n_both, n_draws - n_a - n_b + n_both]]) / n_draws
+    return ConditionalSimulation(*readonly(draws, p_a_given_b, p_b_given_a, joint))
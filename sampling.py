@@ -0,0 +1,157 @@
+"""Resampling and interval engines for the sampling chapter (Chapter 7)."""
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from scipy import stats
+
+from array_tools import readonly
+
+BOOTSTRAP_STATISTICS = ("mean", "median", "proportion")
+BOOTSTRAP_MEMORY_BUDGET = 64 * 2**20  # resamples per chunk, as bytes of their indices plus values
+BOOTSTRAP_BLOCK_DRAWS = 2**19  # indices drawn and gathered per step, sized to stay in cache
+BOOTSTRAP_MAX_DRAWS = 500_000_000  # resamples x n one core bootstraps in about 4 s
+
+BootstrapResult = namedtuple(
+    "BootstrapResult", ["estimate", "replicates", "std_error", "percentile_ci", "bca_ci"]
+)
+
+
+def _resample_means(sample, n_resamples, seed, memory_budget):
+    """Bootstrap means, summed block by block in full float64 precision.
+
+    Each chunk of resamples gets its own spawned generator (so results do
+    not depend on the number of workers) and runs on a thread pool, since
+    NumPy releases the GIL while drawing, gathering and reducing. Within a
+    chunk, indices are drawn a cache-sized block of rows at a time and
+    gathered into one reused buffer, so a worker holds at most
+    BOOTSTRAP_BLOCK_DRAWS indices and values rather than a whole chunk.
+    """
+    n = len(sample)
+    chunk = max(1, memory_budget // (n * 16))
+    block = max(1, min(chunk, BOOTSTRAP_BLOCK_DRAWS // n))
+    starts = range(0, n_resamples, chunk)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    sums = np.empty(n_resamples)
+
+    def run(start, seed_seq):
+        rng = np.random.default_rng(seed_seq)
+        stop = min(start + chunk, n_resamples)
+        gathered = np.empty((min(block, stop - start), n))
+        for row in range(start, stop, block):
+            rows = min(block, stop - row)
+            idx = rng.integers(0, n, size=(rows, n))
+            np.take(sample, idx, out=gathered[:rows])
+            gathered[:rows].sum(axis=1, out=sums[row:row + rows])
+
+    workers = min(len(starts), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, starts, seeds))
+    return sums / n
+
+
+def _resample_medians(sorted_sample, n_resamples, rng):
+    """Bootstrap medians drawn directly from the order-statistic distribution.
+
+    A resample is n draws of sorted[floor(n * U)], so its k-th order
+    statistic is sorted[floor(n * U_(k))] with U_(k) ~ Beta(k, n - k + 1).
+    This has exactly the distribution of index resampling but costs O(1)
+    per resample instead of O(n).
+    """
+    n = len(sorted_sample)
+    k = (n + 1) // 2
+    u_k = rng.beta(k, n - k + 1, n_resamples)
+    lower = sorted_sample[np.minimum((u_k * n).astype(np.int64), n - 1)]
+    if n % 2:
+        return lower
+    u_next = u_k + (1 - u_k) * rng.beta(1, n - k, n_resamples)
+    upper = sorted_sample[np.minimum((u_next * n).astype(np.int64), n - 1)]
+    return (lower + upper) / 2
+
+
+def _jackknife(sample, sorted_sample, statistic):
+    """Leave-one-out estimates in closed form (O(n) for every statistic)."""
+    n = len(sample)
+    if statistic in ("mean", "proportion"):
+        return (sample.sum() - sample) / (n - 1)
+
+    # Median of the n - 1 values left after dropping sorted position i
+    i = np.arange(n)
+
+    def remaining(p):
+        return np.where(p < i, sorted_sample[p], sorted_sample[np.minimum(p + 1, n - 1)])
+
+    m = n - 1
+    if m % 2:
+        return remaining(np.full(n, m // 2))
+    return (remaining(np.full(n, m // 2 - 1)) + remaining(np.full(n, m // 2))) / 2
+
+
+def bootstrap_ci(sample, statistic="mean", n_resamples=10_000, confidence=0.95, seed=42,
+                 memory_budget=BOOTSTRAP_MEMORY_BUDGET):
+    """Percentile and BCa bootstrap intervals for a mean, median or proportion.
+
+    Means are resampled in chunks of `memory_budget` bytes' worth of
+    draws, spread over threads and summed in cache-sized blocks. Medians and
+    proportions use exact shortcuts with the same resampling distribution
+    (uniform order statistics and a binomial draw), so they scale to large
+    samples. For "proportion" the sample should be 0/1 or boolean.
+    """
+    if statistic not in BOOTSTRAP_STATISTICS:
+        raise ValueError(f"Unknown statistic: {statistic}")
+    sample = np.asarray(sample, dtype=float)
+    sample = sample[~np.isnan(sample)]
+    n = len(sample)
+    if n < 2:
+        raise ValueError("Bootstrap needs at least two observations")
+
+    rng = np.random.default_rng(seed)
+    sorted_sample = np.sort(sample)
+    if statistic == "median":
+        estimate = float(np.median(sample))
+        replicates = _resample_medians(sorted_sample, n_resamples, rng)
+    elif statistic == "proportion":
+        estimate = float(sample.mean())
+        replicates = rng.binomial(n, estimate, n_resamples) / n
+    else:
+        estimate = float(sample.mean())
+        replicates = _resample_means(sample, n_resamples, seed, memory_budget)
+
+    alpha = (1 - confidence) / 2
+    percentile_ci = tuple(np.quantile(replicates, [alpha, 1 - alpha]).tolist())
+
+    # BCa: bias correction from the replicates, acceleration from the jackknife
+    below = np.mean(replicates < estimate) + np.mean(replicates == estimate) / 2
+    z0 = stats.norm.ppf(np.clip(below, 1 / (n_resamples + 1), n_resamples / (n_resamples + 1)))
+    jack = _jackknife(sample, sorted_sample, statistic)
+    diffs = jack.mean() - jack
+    denom = 6 * (diffs ** 2).sum() ** 1.5
+    accel = (diffs ** 3).sum() / denom if denom > 0 else 0.0
+    z = stats.norm.ppf([alpha, 1 - alpha])
+    adjusted = stats.norm.cdf(z0 + (z0 + z) / (1 - accel * (z0 + z)))
+    bca_ci = tuple(np.quantile(replicates, adjusted).tolist())
+
+    return BootstrapResult(estimate, replicates, float(replicates.std(ddof=1)),
+                           percentile_ci, bca_ci)
+
+
+PollCoverage = namedtuple("PollCoverage", ["estimates", "margins", "covered", "coverage"])
+
+
+@lru_cache(maxsize=16)
+def poll_coverage(true_support, poll_size, n_polls=100_000, levels=(0.90, 0.95, 0.99), seed=42):
+    """Simulate many polls in one binomial draw and check every Wald interval.
+
+    `estimates` holds each poll's sample proportion. `margins` and
+    `covered` have shape (len(levels), n_polls), and `coverage` maps each
+    level to its empirical coverage rate.
+    """
+    rng = np.random.default_rng(seed)
+    estimates = rng.binomial(poll_size, true_support, n_polls) / poll_size
+    z = stats.norm.ppf(0.5 + np.asarray(levels) / 2)[:, None]
+    margins = z * np.sqrt(estimates * (1 - estimates) / poll_size)
+    covered = np.abs(estimates - true_support) <= margins
+    readonly(estimates, margins, covered)
+    return PollCoverage(estimates, margins, covered, dict(zip(levels, covered.mean(axis=1).tolist())))